@@ -0,0 +1,284 @@
+# API keys for machine oracles (automated lab clients).
+#
+# Keys look like "dsl_<key_id>_<secret>". Only an HMAC-SHA256 digest of the
+# secret is stored in the `oracle_api_keys` table. At runtime every active key
+# is held in an in-memory index keyed by key_id, so verifying a request is one
+# dict lookup plus one HMAC -- no database round trip and no slow password hash.
+# Each key also gets its own token bucket so a single busy client cannot
+# starve the others.
+#
+# Several worker processes may each hold an index: every REFRESH_SECONDS the
+# index adds its usage counters to the table and re-reads the active keys, so
+# keys created or revoked by another process take effect shortly after.
+
+import atexit
+import hashlib
+import hmac
+import secrets
+import sqlite3
+import threading
+import time
+
+KEY_PREFIX = "dsl"
+DEFAULT_RATE_PER_SECOND = 5.0
+DEFAULT_BURST = 20
+REFRESH_SECONDS = 5
+USAGE_COLUMNS = {"requests": "INTEGER NOT NULL DEFAULT 0", "throttled": "INTEGER NOT NULL DEFAULT 0", "last_used": "REAL"}
+
+
+def ensure_api_keys_table_exists(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS oracle_api_keys (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            oracle_id INTEGER NOT NULL REFERENCES oracles (id),
+            key_id TEXT UNIQUE NOT NULL,
+            key_digest TEXT NOT NULL,
+            label TEXT,
+            created_at TEXT,
+            revoked_at TEXT,
+            requests INTEGER NOT NULL DEFAULT 0,
+            throttled INTEGER NOT NULL DEFAULT 0,
+            last_used REAL
+        )
+    """)
+    # Tables created before usage counters were persisted
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(oracle_api_keys)")}
+    for column, definition in USAGE_COLUMNS.items():
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE oracle_api_keys ADD COLUMN {column} {definition}")
+    conn.commit()
+    conn.close()
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self):
+        """Takes one token. Returns 0 on success, else seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class ApiKeyEntry:
+    """In-memory record for one active key, including its usage counters."""
+
+    def __init__(self, key_id, key_digest, oracle_email, label, created_at, bucket):
+        self.key_id = key_id
+        self.key_digest = key_digest
+        self.oracle_email = oracle_email
+        self.label = label
+        self.created_at = created_at
+        self.bucket = bucket
+        self.requests = 0
+        self.throttled = 0
+        self.last_used = None
+        # Usage since the last flush to the database
+        self.unsaved_requests = 0
+        self.unsaved_throttled = 0
+
+    def to_dict(self):
+        return {
+            "key_id": self.key_id,
+            "label": self.label,
+            "created_at": self.created_at,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "last_used": (
+                time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(self.last_used))
+                if self.last_used
+                else None
+            ),
+        }
+
+
+class ApiKeyIndex:
+    """Keeps active keys from SQLite in memory and verifies presented keys against them."""
+
+    def __init__(self, db_path, pepper, rate=DEFAULT_RATE_PER_SECOND, burst=DEFAULT_BURST):
+        self.db_path = db_path
+        self.pepper = pepper.encode() if isinstance(pepper, str) else pepper
+        self.rate = rate
+        self.burst = burst
+        self._entries = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _digest(self, secret):
+        return hmac.new(self.pepper, secret.encode(), hashlib.sha256).hexdigest()
+
+    def _new_entry(self, key_id, key_digest, email, label, created_at):
+        return ApiKeyEntry(
+            key_id, key_digest, email, label, created_at, TokenBucket(self.rate, self.burst)
+        )
+
+    def _load(self):
+        ensure_api_keys_table_exists(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT k.key_id, k.key_digest, o.email, k.label, k.created_at,
+                   k.requests, k.throttled, k.last_used
+            FROM oracle_api_keys k JOIN oracles o ON o.id = k.oracle_id
+            WHERE k.revoked_at IS NULL
+        """)
+        rows = cursor.fetchall()
+        conn.close()
+
+        # Keep the entries (token buckets, unsaved usage) of keys that are still active
+        current = self._entries or {}
+        entries = {}
+        for key_id, key_digest, email, label, created_at, requests, throttled, last_used in rows:
+            entry = current.get(key_id)
+            if entry is None or entry.key_digest != key_digest:
+                entry = self._new_entry(key_id, key_digest, email, label, created_at)
+            entry.requests = requests + entry.unsaved_requests
+            entry.throttled = throttled + entry.unsaved_throttled
+            entry.last_used = max(last_used or 0, entry.last_used or 0) or None
+            entries[key_id] = entry
+        return entries
+
+    def flush(self):
+        """Adds the usage counted since the last flush to the database."""
+        if not self._entries:
+            return
+        updates = []
+        for entry in list(self._entries.values()):
+            requests, throttled = entry.unsaved_requests, entry.unsaved_throttled
+            if not (requests or throttled):
+                continue
+            entry.unsaved_requests -= requests
+            entry.unsaved_throttled -= throttled
+            updates.append((requests, throttled, entry.last_used, entry.key_id))
+        if not updates:
+            return
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            """UPDATE oracle_api_keys
+               SET requests = requests + ?, throttled = throttled + ?,
+                   last_used = MAX(COALESCE(last_used, 0), ?)
+               WHERE key_id = ?""",
+            updates,
+        )
+        conn.commit()
+        conn.close()
+
+    def entries(self):
+        if self._entries is None or time.monotonic() - self._loaded_at >= REFRESH_SECONDS:
+            with self._lock:
+                if self._entries is None or time.monotonic() - self._loaded_at >= REFRESH_SECONDS:
+                    self._refresh()
+        return self._entries
+
+    def _refresh(self):
+        """Flushes usage and re-reads keys. Caller holds the lock."""
+        self.flush()
+        self._entries = self._load()
+        self._loaded_at = time.monotonic()
+
+    def reload(self):
+        """Re-reads keys from the database right away instead of on the next refresh."""
+        with self._lock:
+            self._refresh()
+
+    def create_key(self, oracle_email, label=None):
+        """Issues a new key for an oracle. The raw key is only ever returned here."""
+        ensure_api_keys_table_exists(self.db_path)
+        key_id = secrets.token_hex(6)
+        secret = secrets.token_urlsafe(32)
+        key_digest = self._digest(secret)
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM oracles WHERE email = ?", (oracle_email,))
+        row = cursor.fetchone()
+        if not row:
+            conn.close()
+            raise ValueError(f"Unknown oracle: {oracle_email}")
+        cursor.execute(
+            "INSERT INTO oracle_api_keys (oracle_id, key_id, key_digest, label, created_at) VALUES (?, ?, ?, ?, datetime('now'))",
+            (row[0], key_id, key_digest, label),
+        )
+        conn.commit()
+        cursor.execute("SELECT created_at FROM oracle_api_keys WHERE key_id = ?", (key_id,))
+        created_at = cursor.fetchone()[0]
+        conn.close()
+
+        entry = self._new_entry(key_id, key_digest, oracle_email, label, created_at)
+        entries = self.entries()
+        with self._lock:
+            entries[key_id] = entry
+        return f"{KEY_PREFIX}_{key_id}_{secret}"
+
+    def revoke_key(self, oracle_email, key_id):
+        """Revokes one of the oracle's keys. Returns False if it wasn't theirs/active."""
+        entry = self.entries().get(key_id)
+        if entry is None or entry.oracle_email != oracle_email:
+            return False
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "UPDATE oracle_api_keys SET revoked_at = datetime('now') WHERE key_id = ?",
+            (key_id,),
+        )
+        conn.commit()
+        conn.close()
+        entries = self.entries()
+        with self._lock:
+            entries.pop(key_id, None)
+        return True
+
+    def keys_for(self, oracle_email):
+        # Snapshot under the lock: keys may be created or revoked on other request threads
+        entries = self.entries()
+        with self._lock:
+            snapshot = list(entries.values())
+        return [e.to_dict() for e in snapshot if e.oracle_email == oracle_email]
+
+    def authenticate(self, raw_key):
+        """Returns the ApiKeyEntry for a valid key, or None."""
+        try:
+            prefix, key_id, secret = raw_key.split("_", 2)
+        except (AttributeError, ValueError):
+            return None
+        if prefix != KEY_PREFIX:
+            return None
+        entry = self.entries().get(key_id)
+        if entry is None:
+            return None
+        if not hmac.compare_digest(entry.key_digest, self._digest(secret)):
+            return None
+        return entry
+
+    def check(self, raw_key):
+        """Authenticates and rate-limits one request.
+
+        Returns (entry, retry_after): entry is None for an invalid key;
+        retry_after > 0 means the key is valid but currently throttled.
+        """
+        entry = self.authenticate(raw_key)
+        if entry is None:
+            return None, 0
+        retry_after = entry.bucket.consume()
+        entry.last_used = time.time()
+        if retry_after:
+            entry.throttled += 1
+            entry.unsaved_throttled += 1
+        else:
+            entry.requests += 1
+            entry.unsaved_requests += 1
+        return entry, retry_after
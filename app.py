@@ -1,6 +1,8 @@
+import datetime
+import math
 import os
 import sqlite3
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -8,13 +10,38 @@ from flask import redirect, url_for, session
 
 # --- Import Custom Modules ---
 # Import node data from our new dedicated file
-from registered_nodes import get_registered_nodes, get_total_nodes_count
+from registered_nodes import (
+    get_node_status_counts,
+    get_registered_nodes,
+    get_total_nodes_count,
+    node_registry,
+)
+from api_keys import ApiKeyIndex, ensure_api_keys_table_exists
+from audit import IntegrityAuditor, ensure_audit_tables_exist
+from incremental import DatasetStore, ensure_dataset_versions_table_exists
+from registry_export import EXPORT_FORMATS, gzip_stream, iter_registry_export
+from registry_writer import GroupCommitWriter
+from telemetry import TELEMETRY_FOLDER, Backpressure, TelemetryIngestor
+from events import EventBus, DashboardWatcher, stream_events
+from registry_query import (
+    ensure_registry_indexes,
+    iter_registry_page_json,
+    parse_registry_filters,
+)
 
 # Assuming these are your existing functional modules
 # Note: Ensure these modules are correctly set up to use .env variables internally if needed.
 try:
-    from storage import store_file_metadata, verify_file_integrity, generate_file_hash
-    from blockchain import anchor_on_chain, web3  # Importing web3 to get current block
+    from storage import (
+        store_file_metadata,
+        verify_file_integrity,
+        verify_file_chunks,
+        fetch_ipfs_metadata,
+        request_ipfs_metadata,
+        generate_file_hash,
+        pin_metadata,
+    )
+    from blockchain import anchor_on_chain, verify_on_chain, web3  # Importing web3 to get current block
 except ImportError as e:
     print(
         f"Warning: Could not import core modules: {e}. Ensure blockchain.py and storage.py exist."
@@ -31,7 +58,10 @@ app.secret_key = os.getenv("SECRET_KEY", "dev-secret-key")
 # --- Configuration ---
 UPLOAD_FOLDER = "uploads"
 ALLOWED_EXTENSIONS = {"csv", "json", "txt"}
+NODES_PAGE_SIZE = 25  # Rows in the dashboard's Verified Research Nodes table
+MAX_HEARTBEAT_BATCH = 5000
 DATABASE_FILE = "file_registry.db"  # Pointing to your existing DB file
+REGISTRY_WRITE_TIMEOUT = 10  # Seconds to wait for the group-commit writer
 
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16 MB limit
@@ -40,8 +70,28 @@ NETWORK_NAME = os.getenv("NETWORK_NAME", "Unknown Network")  # Fetched from .env
 # Ensure the upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# --- Oracle API Keys ---
+# Keyed digest secret for stored API keys; falls back to the session secret.
+API_KEY_PEPPER = os.getenv("API_KEY_PEPPER", app.secret_key)
+API_KEY_RATE = float(os.getenv("API_KEY_RATE", "5"))  # Requests per second per key
+API_KEY_BURST = int(os.getenv("API_KEY_BURST", "20"))
+api_key_index = ApiKeyIndex(DATABASE_FILE, API_KEY_PEPPER, API_KEY_RATE, API_KEY_BURST)
+
+# Set once the registry table and its indexes have been created in this process
+registry_schema_ready = False
+# Set once the dataset_versions table has been created in this process
+dataset_schema_ready = False
+
 
 # --- Database Helper Functions ---
+def ensure_dataset_schema():
+    """Creates the dataset_versions table on first use in this process."""
+    global dataset_schema_ready
+    if not dataset_schema_ready:
+        ensure_dataset_versions_table_exists(DATABASE_FILE)
+        dataset_schema_ready = True
+
+
 def get_db_connection():
     """Creates a connection to the existing file_registry.db"""
     # Check if DB exists first to avoid errors if running fresh
@@ -68,6 +118,7 @@ def ensure_registry_table_exists():
         )
     """)
     conn.commit()
+    ensure_registry_indexes(conn)
     conn.close()
 
 
@@ -112,6 +163,16 @@ def authenticate_oracle(email, password):
     return check_password_hash(row[0], password)
 
 
+def format_activity_item(filename, tx_hash, timestamp):
+    """Formats one anchored registry row for the Recent Chain Activity feed."""
+    short_tx = f"{tx_hash[:6]}...{tx_hash[-4:]}"
+    return {
+        # You might want to format the timestamp string nicely here using datetime
+        "text": f"File '{filename}' anchored on-chain. Tx: {short_tx}",
+        "time": timestamp,
+    }
+
+
 def get_anchored_stats_from_db():
     """Queries the local DB for counts and recent activity."""
     conn = get_db_connection()
@@ -139,17 +200,10 @@ def get_anchored_stats_from_db():
         """)
         recent_rows = cursor.fetchall()
 
-        activity_feed = []
-        for row in recent_rows:
-            # Format the data for the UI
-            short_tx = f"{row['tx_hash'][:6]}...{row['tx_hash'][-4:]}"
-            activity_feed.append(
-                {
-                    # You might want to format the timestamp string nicely here using datetime
-                    "text": f"File '{row['filename']}' anchored on-chain. Tx: {short_tx}",
-                    "time": row["timestamp"],
-                }
-            )
+        activity_feed = [
+            format_activity_item(row["filename"], row["tx_hash"], row["timestamp"])
+            for row in recent_rows
+        ]
 
         conn.close()
         return {"count": total_anchored, "activity": activity_feed}
@@ -172,12 +226,180 @@ def get_current_block_number():
     return "Offline"
 
 
+# --- Live Dashboard Events ---
+# One bus and one watcher per process; every SSE viewer shares this fan-out.
+event_bus = EventBus()
+dashboard_watcher = DashboardWatcher(
+    event_bus,
+    get_current_block_number,
+    node_registry.statuses,
+    get_node_status_counts,
+)
+
+
+# --- Registry Writes & Telemetry Anchoring ---
+# All registry inserts go through one writer thread that group-commits them
+registry_writer = GroupCommitWriter(
+    DATABASE_FILE, setup=lambda conn: ensure_registry_table_exists()
+)
+
+
+def record_registry_entry(filename, file_hash, ipfs_url, tx_hash):
+    """Queues an anchored file for the registry and announces it to live dashboards.
+
+    Returns a Future that resolves once the row is committed.
+    """
+    # Same format as SQLite's datetime('now'), computed here so the event needs no read-back
+    recorded_at = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    future = registry_writer.submit(
+        "INSERT INTO registry (filename, sha256, ipfs_url, tx_hash, timestamp) VALUES (?, ?, ?, ?, ?)",
+        (filename, file_hash, ipfs_url, tx_hash, recorded_at),
+    )
+
+    def announce(done):
+        if done.exception() is None:
+            event_bus.publish(
+                "registry", format_activity_item(filename, tx_hash, recorded_at)
+            )
+
+    if tx_hash:
+        future.add_done_callback(announce)
+    return future
+
+
+def registry_has_entry(file_hash, tx_hash):
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    try:
+        row = conn.execute(
+            "SELECT 1 FROM registry WHERE sha256 = ? AND tx_hash = ? LIMIT 1",
+            (file_hash, tx_hash),
+        ).fetchone()
+    finally:
+        conn.close()
+    return row is not None
+
+
+def anchor_telemetry_segment(segment_path, progress):
+    """Hashes, pins, anchors and records one sealed telemetry segment (runs on the telemetry worker).
+
+    Each step's result is kept in `progress`, so a retry redoes only the step that failed.
+    """
+    if "ipfs_url" not in progress:
+        progress["sha256"] = generate_file_hash(segment_path)
+        ipfs_url = store_file_metadata(segment_path)
+        if not ipfs_url:
+            raise RuntimeError("IPFS upload failed.")
+        progress["ipfs_url"] = ipfs_url
+    if "tx_hash" not in progress:
+        progress["tx_hash"] = anchor_on_chain(progress["sha256"], progress["ipfs_url"])
+    file_hash, ipfs_url, tx_hash = progress["sha256"], progress["ipfs_url"], progress["tx_hash"]
+    # A write that timed out earlier may still have committed; don't insert it twice
+    if progress.get("record_attempted") and registry_has_entry(file_hash, tx_hash):
+        return
+    progress["record_attempted"] = True
+    # Keep the node folder in the name so segments from different nodes stay distinguishable
+    name = os.path.relpath(segment_path, TELEMETRY_FOLDER).replace(os.sep, "/")
+    record_registry_entry(name, file_hash, ipfs_url, tx_hash).result(REGISTRY_WRITE_TIMEOUT)
+
+
+telemetry_ingestor = TelemetryIngestor(anchor_telemetry_segment, TELEMETRY_FOLDER)
+
+
+def anchor_dataset_version(name, version, size, chunk_size, root, previous_root):
+    """Pins and anchors the MMR root of one append-only dataset version."""
+    metadata = {
+        "file_name": name,
+        "dataset_version": version,
+        "size": size,
+        "chunk_size": chunk_size,
+        "mmr_root": root,
+        "previous_mmr_root": previous_root,
+        "timestamp": datetime.datetime.now().isoformat(),
+    }
+    ipfs_url = pin_metadata(metadata, f"{name}_v{version}")
+    if not ipfs_url:
+        raise RuntimeError("IPFS upload failed.")
+    tx_hash = anchor_on_chain(root, ipfs_url)
+    try:
+        record_registry_entry(f"{name}@v{version}", root, ipfs_url, tx_hash).result(
+            REGISTRY_WRITE_TIMEOUT
+        )
+    except Exception as e:
+        print(f"Warning: failed to write registry record: {e}")
+    return ipfs_url, tx_hash
+
+
+dataset_store = DatasetStore(DATABASE_FILE)
+
+
+# --- Registry Integrity Audit ---
+# Re-checks anchored records against IPFS and the chain, slowly, in the background
+AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "1").lower() in ("1", "true", "yes", "on")
+AUDIT_DASHBOARD_FINDINGS = 5
+integrity_auditor = IntegrityAuditor(
+    DATABASE_FILE,
+    # Raises on gateway outages, so they are reported as inconclusive, not failing
+    lambda ipfs_url: request_ipfs_metadata(ipfs_url),
+    lambda sha256: verify_on_chain(sha256),
+)
+
+
+def get_audit_summary(limit=AUDIT_DASHBOARD_FINDINGS):
+    try:
+        return integrity_auditor.summary(limit)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+
 # --- Helper Functions ---
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def is_truthy(value):
+    return str(value or "").lower() in ("1", "true", "yes", "on")
+
+
+def get_request_api_key():
+    """Reads an oracle API key from the X-API-Key or Authorization: Bearer header."""
+    key = request.headers.get("X-API-Key")
+    if key:
+        return key
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        return auth[len("Bearer "):].strip()
+    return None
+
+
+def require_oracle_auth():
+    """Authenticates a request by API key or oracle session.
+
+    Returns None when the caller may proceed, else an error (response, status) tuple.
+    """
+    raw_key = get_request_api_key()
+    if raw_key:
+        key_entry, retry_after = api_key_index.check(raw_key)
+        if key_entry is None:
+            return jsonify({"error": "Invalid API key.", "is_valid": False}), 401
+        if retry_after:
+            resp = jsonify({"error": "Rate limit exceeded.", "is_valid": False})
+            resp.headers["Retry-After"] = str(math.ceil(retry_after))
+            return resp, 429
+    elif "oracle_email" not in session:
+        return jsonify({"error": "Authentication required.", "is_valid": False}), 401
+    return None
+
+
 # --- Routes ---
+@app.before_request
+def start_background_services():
+    # Idempotent; covers servers that import the app without running __main__
+    telemetry_ingestor.start()
+    if AUDIT_ENABLED:
+        integrity_auditor.start()
 
 
 @app.route("/")
@@ -187,19 +409,32 @@ def index():
     # 1. Gather Data from various sources
     db_stats = get_anchored_stats_from_db()
     total_nodes = get_total_nodes_count()  # From registered_nodes.py
-    current_block = get_current_block_number()  # From real blockchain connection
-    node_list = get_registered_nodes()  # From registered_nodes.py
+    node_counts = get_node_status_counts()
+    # Reuse the watcher's recent RPC result when live viewers keep it fresh
+    current_block = (
+        dashboard_watcher.cached_block_number() or get_current_block_number()
+    )
+    # Only one page of nodes is rendered; the fleet can be 10k+ sensors
+    node_pages = max(1, math.ceil(total_nodes / NODES_PAGE_SIZE))
+    node_page = min(max(request.args.get("nodes_page", 1, type=int), 1), node_pages)
+    node_list = get_registered_nodes(
+        (node_page - 1) * NODES_PAGE_SIZE, NODES_PAGE_SIZE
+    )  # From registered_nodes.py
 
     # 2. Structure data for the template
     dashboard_data = {
         "stats": {
-            "total_nodes": total_nodes,
+            "total_nodes": f"{total_nodes:,}",
             "data_batches": f"{db_stats['count']:,}",  # comma format numbers
             "current_block": current_block,
             "network_name": NETWORK_NAME,  # From .env
         },
         "nodes": node_list,
+        "node_counts": node_counts,
+        "node_page": node_page,
+        "node_pages": node_pages,
         "activity": db_stats["activity"],
+        "audit": get_audit_summary(),
     }
 
     return render_template("dashboard.html", **dashboard_data)
@@ -229,8 +464,10 @@ def auto_secure_file():
             # Step 1: Hash
             file_hash = generate_file_hash(filepath)
 
-            # Step 2: IPFS
-            ipfs_url = store_file_metadata(filepath)
+            # Step 2: IPFS (optionally with a per-chunk hash manifest)
+            ipfs_url = store_file_metadata(
+                filepath, chunk_manifest=is_truthy(request.form.get("chunk_manifest"))
+            )
             if not ipfs_url:
                 return jsonify({"error": "IPFS upload failed."}), 500
 
@@ -241,15 +478,9 @@ def auto_secure_file():
             # Step 4: Record anchoring in local DB for activity feed
             db_recorded = False
             try:
-                ensure_registry_table_exists()
-                conn = sqlite3.connect(DATABASE_FILE)
-                cur = conn.cursor()
-                cur.execute(
-                    "INSERT INTO registry (filename, sha256, ipfs_url, tx_hash, timestamp) VALUES (?, ?, ?, ?, datetime('now'))",
-                    (filename, file_hash, ipfs_url, tx_hash),
+                record_registry_entry(filename, file_hash, ipfs_url, tx_hash).result(
+                    REGISTRY_WRITE_TIMEOUT
                 )
-                conn.commit()
-                conn.close()
                 db_recorded = True
                 print(f"Registry insert succeeded for {filename}, tx={tx_hash}")
             except Exception as e:
@@ -291,11 +522,37 @@ def verify_file():
     if not ipfs_url:
         return jsonify({'error': 'Missing ipfs_url parameter.'}), 400
 
+    # Optional chunk-level verification against the metadata's chunk manifest
+    chunk_mode = request.form.get('mode') == 'chunks'
+    byte_range = None
+    if request.form.get('range_start') or request.form.get('range_end'):
+        try:
+            byte_range = (int(request.form.get('range_start') or 0), int(request.form['range_end']))
+        except (KeyError, ValueError):
+            return jsonify({'error': 'range_start/range_end must be integers.'}), 400
+        chunk_mode = True
+
     filename = secure_filename(file.filename)
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"verify_{filename}")
     file.save(filepath)
 
     try:
+        if chunk_mode:
+            meta = fetch_ipfs_metadata(ipfs_url)
+            if meta is None:
+                return jsonify({'error': 'Failed to fetch IPFS metadata.'}), 502
+            manifest = meta.get('chunk_manifest')
+            if not manifest:
+                return jsonify({'error': 'This record has no chunk manifest.'}), 400
+            report = verify_file_chunks(
+                filepath,
+                manifest,
+                fail_fast=is_truthy(request.form.get('fail_fast')),
+                byte_range=byte_range,
+            )
+            report['ipfs_url'] = ipfs_url
+            return jsonify(report), 200
+
         # Use storage.verify_file_integrity which compares computed SHA with IPFS metadata
         is_valid = verify_file_integrity(filepath, ipfs_url)
         # For extra debugging/visibility, also return the computed SHA
@@ -306,6 +563,8 @@ def verify_file():
             'ipfs_url': ipfs_url
         }
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Verification failed: {e}'}), 500
     finally:
@@ -316,6 +575,240 @@ def verify_file():
             pass
 
 
+@app.route("/api/registry", methods=["GET"])
+def api_registry():
+    """Paginated, filterable view of the registry for auditors.
+
+    Query params: limit, cursor, since, until, has_tx, sha256_prefix, q.
+    Follow `next_cursor` from each response to fetch the next page.
+    """
+    try:
+        filters = parse_registry_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not os.path.exists(DATABASE_FILE):
+        return jsonify({"items": [], "count": 0, "next_cursor": None}), 200
+    global registry_schema_ready
+    if not registry_schema_ready:
+        # Creates the search index on first use if the app wasn't started via __main__
+        try:
+            ensure_registry_table_exists()
+            registry_schema_ready = True
+        except sqlite3.Error as e:
+            return jsonify({"error": f"Database error: {e}"}), 500
+
+    return Response(iter_registry_page_json(DATABASE_FILE, filters), mimetype="application/json")
+
+
+# --- Node Registry Routes ---
+
+
+@app.route("/api/nodes", methods=["GET"])
+def api_nodes():
+    """Paginated node list plus status aggregates."""
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", 100, type=int), 1), 1000)
+    return jsonify(
+        {
+            "total": get_total_nodes_count(),
+            "counts": get_node_status_counts(),
+            "nodes": get_registered_nodes(offset, limit),
+        }
+    )
+
+
+@app.route("/nodes/register", methods=["POST"])
+def register_nodes():
+    # Accepts JSON {"nodes": [{"id", "type", "location"}, ...]}
+    auth_error = require_oracle_auth()
+    if auth_error:
+        return auth_error
+    data = request.get_json(silent=True) or {}
+    nodes = data.get("nodes")
+    if not isinstance(nodes, list) or not nodes:
+        return jsonify({"error": "Expected a non-empty 'nodes' list."}), 400
+    try:
+        registered = node_registry.register(nodes)
+    except (ValueError, AttributeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"registered": registered}), 200
+
+
+@app.route("/nodes/heartbeat", methods=["POST"])
+def node_heartbeat():
+    # Accepts JSON {"heartbeats": [{"id", "status"}, ...]} batched by a gateway or node
+    auth_error = require_oracle_auth()
+    if auth_error:
+        return auth_error
+    data = request.get_json(silent=True) or {}
+    heartbeats = data.get("heartbeats")
+    if not isinstance(heartbeats, list) or not heartbeats:
+        return jsonify({"error": "Expected a non-empty 'heartbeats' list."}), 400
+    if len(heartbeats) > MAX_HEARTBEAT_BATCH:
+        return jsonify({"error": f"At most {MAX_HEARTBEAT_BATCH} heartbeats per batch."}), 413
+    try:
+        accepted, unknown = node_registry.record_heartbeats(heartbeats)
+    except (ValueError, AttributeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"accepted": accepted, "unknown": unknown}), 200
+
+
+@app.route("/nodes/<node_id>/telemetry", methods=["POST"])
+def ingest_telemetry(node_id):
+    # Accepts JSON {"readings": [{...}, ...]}; readings are appended to the node's open segment
+    auth_error = require_oracle_auth()
+    if auth_error:
+        return auth_error
+    if not node_registry.has_node(node_id):
+        return jsonify({"error": f"Unknown node: {node_id}"}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        written = telemetry_ingestor.ingest(node_id, data.get("readings"))
+    except Backpressure as e:
+        resp = jsonify({"error": str(e)})
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp, 503
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(
+        {
+            "accepted": len(data["readings"]),
+            "bytes": written,
+            "pending_segments": telemetry_ingestor.pending_segments(),
+        }
+    ), 202
+
+
+# --- Append-Only Dataset Routes ---
+
+
+@app.route("/datasets/<name>/append", methods=["POST"])
+def append_dataset(name):
+    # Expects form-data: file = only the bytes appended since the last version
+    auth_error = require_oracle_auth()
+    if auth_error:
+        return auth_error
+    if "file" not in request.files:
+        return jsonify({"error": "No file part detected."}), 400
+    data = request.files["file"].read()
+    try:
+        ensure_dataset_schema()
+        version = dataset_store.append(name, data, anchor_dataset_version)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Processing failed: {str(e)}"}), 500
+    return jsonify({"status": "success", **version}), 200
+
+
+@app.route("/datasets/<name>", methods=["GET"])
+def dataset_versions(name):
+    ensure_dataset_schema()
+    versions = dataset_store.versions(name)
+    if not versions:
+        return jsonify({"error": f"Unknown dataset: {name}"}), 404
+    for v in versions:
+        del v["peaks"]
+    return jsonify({"dataset": name, "versions": versions})
+
+
+@app.route("/datasets/<name>/proof", methods=["GET"])
+def dataset_prefix_proof(name):
+    """Proof that version `from` is a prefix of version `to` (see incremental.verify_prefix_proof)."""
+    old_version = request.args.get("from", type=int)
+    new_version = request.args.get("to", type=int)
+    if old_version is None or new_version is None:
+        return jsonify({"error": "Missing 'from' or 'to' version."}), 400
+    try:
+        ensure_dataset_schema()
+        proof = dataset_store.prefix_proof(name, old_version, new_version)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(proof)
+
+
+def get_dashboard_snapshot(node_ids=()):
+    """Counters, recent activity and node statuses a (re)connecting viewer resyncs from."""
+    # Read first: registry events up to this id are already in the counts below
+    after_id = event_bus.last_id()
+    db_stats = get_anchored_stats_from_db()
+    node_summary = get_node_status_counts()
+    node_summary["total"] = get_total_nodes_count()
+    return {
+        "after_id": after_id,
+        "data_batches": db_stats["count"],
+        "activity": db_stats["activity"],
+        "node_summary": node_summary,
+        "nodes": node_registry.statuses_for(node_ids),
+    }
+
+
+@app.route("/events")
+def dashboard_events():
+    """Server-Sent Events stream of registry, block and node updates for the dashboard.
+
+    ?nodes=<id>,<id> lists the node rows the viewer shows, so their statuses are
+    included in the snapshot sent on every (re)connect.
+    """
+    dashboard_watcher.start()
+    node_ids = [i for i in request.args.get("nodes", "").split(",") if i][:NODES_PAGE_SIZE]
+    return Response(
+        stream_events(
+            event_bus,
+            lambda: dashboard_watcher.snapshot_events(get_dashboard_snapshot(node_ids)),
+        ),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/registry/export", methods=["GET"])
+def api_registry_export():
+    """Streams every registry record as JSONL or CSV, oldest first.
+
+    Query params: format (jsonl|csv), after_id (export ids > after_id), gzip (1 to compress).
+    """
+    fmt = request.args.get("format", "jsonl")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}."}), 400
+    if "since" in request.args:
+        # Renamed: `since` is a timestamp everywhere else in the registry API
+        return jsonify({"error": "Use after_id (a record id) instead of since."}), 400
+    try:
+        after_id = int(request.args.get("after_id", 0))
+    except ValueError:
+        return jsonify({"error": "after_id must be an integer record id."}), 400
+    if after_id < 0:
+        return jsonify({"error": "after_id must not be negative."}), 400
+    compress = is_truthy(request.args.get("gzip"))
+
+    if not os.path.exists(DATABASE_FILE):
+        return jsonify({"error": "Registry database not found."}), 404
+
+    filename = f"registry.{fmt}" + (".gz" if compress else "")
+    mimetype = "application/x-ndjson" if fmt == "jsonl" else "text/csv"
+    chunks = iter_registry_export(DATABASE_FILE, fmt, after_id)
+    if compress:
+        chunks = gzip_stream(chunks)
+        mimetype = "application/gzip"
+    return Response(
+        chunks,
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@app.route("/api/audit", methods=["GET"])
+def api_audit():
+    """Integrity audit progress and the most recent failing records."""
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+    summary = get_audit_summary(limit)
+    if summary is None:
+        return jsonify({"error": "Audit data unavailable."}), 500
+    return jsonify(summary)
+
+
 @app.route("/about")
 def about():
     return render_template("about.html")
@@ -359,13 +852,52 @@ def oracle_logout():
 def oracle_dashboard():
     if "oracle_email" not in session:
         return redirect(url_for("oracle_login"))
+    email = session.get("oracle_email")
+    return render_template(
+        "oracle_dashboard.html",
+        oracle_email=email,
+        api_keys=api_key_index.keys_for(email),
+    )
+
+
+@app.route("/oracle/api-keys", methods=["POST"])
+def oracle_create_api_key():
+    if "oracle_email" not in session:
+        return redirect(url_for("oracle_login"))
+    email = session.get("oracle_email")
+    try:
+        new_key = api_key_index.create_key(email, request.form.get("label") or None)
+    except Exception as e:
+        return render_template(
+            "oracle_dashboard.html",
+            oracle_email=email,
+            api_keys=api_key_index.keys_for(email),
+            error=str(e),
+        )
+    # The raw key is shown exactly once; only its digest is stored
     return render_template(
-        "oracle_dashboard.html", oracle_email=session.get("oracle_email")
+        "oracle_dashboard.html",
+        oracle_email=email,
+        api_keys=api_key_index.keys_for(email),
+        new_key=new_key,
     )
 
 
+@app.route("/oracle/api-keys/<key_id>/revoke", methods=["POST"])
+def oracle_revoke_api_key(key_id):
+    if "oracle_email" not in session:
+        return redirect(url_for("oracle_login"))
+    api_key_index.revoke_key(session.get("oracle_email"), key_id)
+    return redirect(url_for("oracle_dashboard"))
+
+
 @app.route("/oracle/verify", methods=["POST"])
 def oracle_verify():
+    # Machine clients authenticate with an API key; browser oracles with their session
+    auth_error = require_oracle_auth()
+    if auth_error:
+        return auth_error
+
     # Accepts form or JSON with 'sha256' and 'ipfs_url'
     data = request.get_json() if request.is_json else request.form
     sha = data.get("sha256") or data.get("sha")
@@ -421,11 +953,33 @@ if __name__ == "__main__":
     # Ensure DB tables exist before starting
     try:
         ensure_registry_table_exists()
+        registry_schema_ready = True
     except Exception as e:
         print(f"Warning: could not ensure registry table at startup: {e}")
     try:
         ensure_oracles_table_exists()
     except Exception as e:
         print(f"Warning: could not ensure oracles table at startup: {e}")
+    try:
+        ensure_api_keys_table_exists(DATABASE_FILE)
+    except Exception as e:
+        print(f"Warning: could not ensure API keys table at startup: {e}")
+    try:
+        node_registry.ensure_table_exists()
+    except Exception as e:
+        print(f"Warning: could not ensure nodes table at startup: {e}")
+    try:
+        ensure_dataset_schema()
+    except Exception as e:
+        print(f"Warning: could not ensure dataset_versions table at startup: {e}")
+    try:
+        ensure_audit_tables_exist(DATABASE_FILE)
+    except Exception as e:
+        print(f"Warning: could not ensure audit tables at startup: {e}")
+
+    # With the debug reloader only the child process serves; start its services right away
+    # so leftover telemetry segments are recovered without waiting for a request
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
 
     app.run(debug=True, port=5000)
@@ -0,0 +1,383 @@
+# Continuous integrity audit of the registry.
+#
+# A background thread walks the `registry` table in id order, a small batch at
+# a time, and re-checks every anchored record:
+#   ipfs   the metadata at `ipfs_url` is still retrievable and names the same
+#          digest (`sha256_hash`, or `mmr_root` for append-only dataset versions)
+#   chain  `verify_on_chain` still finds the digest in the contract
+# Each record's latest result is kept in `registry_audit` (one row per record):
+# ok = 1 passed, 0 failed, NULL inconclusive (a checker was unavailable, so
+# nothing was learned; not counted as failing). If the gateway or the chain was
+# unavailable for every record of a batch, it is treated as an outage: nothing
+# is saved, the cursor stays put and the batch is retried after
+# AUDIT_RETRY_SECONDS (up to MAX_OUTAGE_RETRIES times, so a batch of CIDs that
+# always time out cannot stall the audit for good).
+# The position is saved in `audit_cursor` after every batch, so a restart
+# resumes where the last run stopped; at the end of the table the cursor
+# wraps around and the next pass starts after AUDIT_PASS_INTERVAL seconds.
+# Checks are spread out by a token bucket (AUDIT_RATE records/second) and run
+# on at most AUDIT_CONCURRENCY threads, so the audit stays in the background
+# of live traffic.
+#
+# One-off pass from the command line:
+#   python audit.py --once --rate 20 --concurrency 4
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from api_keys import TokenBucket
+
+AUDIT_RATE = float(os.getenv("AUDIT_RATE", "2"))  # Records checked per second
+AUDIT_CONCURRENCY = int(os.getenv("AUDIT_CONCURRENCY", "2"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "50"))
+AUDIT_PASS_INTERVAL = int(os.getenv("AUDIT_PASS_INTERVAL", "3600"))  # Pause between full passes
+AUDIT_RETRY_SECONDS = 60  # Back-off while the gateway or chain is unavailable
+MAX_OUTAGE_RETRIES = 5  # Then the batch is saved as inconclusive and the scan moves on
+CURSOR_NAME = "registry"
+
+# Check outcomes
+OK = "ok"
+MISSING = "missing"  # no IPFS URL recorded
+UNRETRIEVABLE = "unretrievable"  # gateway answered but has no (valid) metadata for the CID
+MISMATCH = "mismatch"  # metadata names a different digest
+NOT_ANCHORED = "not_anchored"  # contract does not know the digest
+UNAVAILABLE = "unavailable"  # gateway or chain could not be asked; inconclusive
+FAILED = {MISSING, UNRETRIEVABLE, MISMATCH, NOT_ANCHORED}
+
+
+class CheckerUnavailable(Exception):
+    """Raised when the gateway or chain was unavailable for a whole batch."""
+
+
+def verdict(ipfs_status, chain_status):
+    """1 if both checks passed, 0 if either definitely failed, None if inconclusive."""
+    if {ipfs_status, chain_status} & FAILED:
+        return 0
+    if ipfs_status == OK and chain_status == OK:
+        return 1
+    return None
+
+
+def ensure_audit_tables_exist(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS registry_audit (
+                registry_id INTEGER PRIMARY KEY,
+                filename TEXT,
+                sha256 TEXT,
+                ipfs_status TEXT NOT NULL,
+                chain_status TEXT NOT NULL,
+                ok INTEGER,
+                detail TEXT,
+                checked_at TEXT NOT NULL,
+                first_failed_at TEXT
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_registry_audit_failing ON registry_audit (ok, checked_at)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audit_cursor (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                passes INTEGER NOT NULL,
+                updated_at TEXT
+            )
+            """
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def check_record(sha256, ipfs_url, fetch_metadata, verify_anchor):
+    """Re-checks one registry record. Returns (ipfs_status, chain_status, detail).
+
+    fetch_metadata returns None for an unknown CID and raises when the gateway
+    cannot be reached; verify_anchor raises when the chain cannot be reached.
+    """
+    details = []
+    if not ipfs_url:
+        ipfs_status = MISSING
+    else:
+        try:
+            metadata = fetch_metadata(ipfs_url)
+        except Exception as e:
+            metadata = None
+            ipfs_status = UNAVAILABLE
+            details.append(f"Gateway unavailable: {e}")
+        else:
+            ipfs_status = UNRETRIEVABLE
+        if isinstance(metadata, dict):
+            pinned = metadata.get("sha256_hash") or metadata.get("mmr_root")
+            if pinned == sha256:
+                ipfs_status = OK
+            else:
+                ipfs_status = MISMATCH
+                details.append(f"IPFS metadata names {pinned or 'no digest'}")
+
+    try:
+        chain_status = OK if verify_anchor(sha256) else NOT_ANCHORED
+    except Exception as e:
+        chain_status = UNAVAILABLE
+        details.append(f"Chain unavailable: {e}")
+    return ipfs_status, chain_status, "; ".join(details) or None
+
+
+class IntegrityAuditor:
+    """Rate-limited background scanner over the registry table.
+
+    fetch_metadata: callable(ipfs_url) -> metadata dict, or None for an unknown
+    CID; raises if the gateway is unreachable.
+    verify_anchor: callable(sha256) -> bool; raises if the chain is unreachable.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        fetch_metadata,
+        verify_anchor,
+        rate=AUDIT_RATE,
+        concurrency=AUDIT_CONCURRENCY,
+        batch_size=AUDIT_BATCH_SIZE,
+        pass_interval=AUDIT_PASS_INTERVAL,
+    ):
+        self.db_path = db_path
+        self.fetch_metadata = fetch_metadata
+        self.verify_anchor = verify_anchor
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size
+        self.pass_interval = pass_interval
+        self._bucket = TokenBucket(rate, self.concurrency)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._tables_ready = False
+        self._outage_retries = 0
+        self.checked_count = 0
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="registry-audit", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self):
+        """Audits batch after batch until stop(); pauses between full passes."""
+        while not self._stop.is_set():
+            try:
+                wrapped = self.audit_batch()
+            except Exception as e:
+                print(f"Warning: registry audit batch failed: {e}")
+                self._stop.wait(AUDIT_RETRY_SECONDS)
+                continue
+            if wrapped:
+                self._stop.wait(self.pass_interval)
+
+    def run_pass(self):
+        """Audits from the saved cursor to the end of the table (for one-off runs)."""
+        while not self.audit_batch():
+            pass
+
+    # --- Scanning ---
+    def _connect(self):
+        if not self._tables_ready:
+            ensure_audit_tables_exist(self.db_path)
+            self._tables_ready = True
+        return sqlite3.connect(self.db_path)
+
+    def _cursor(self, conn):
+        row = conn.execute(
+            "SELECT last_id, passes FROM audit_cursor WHERE name = ?", (CURSOR_NAME,)
+        ).fetchone()
+        return row if row else (0, 0)
+
+    def _wait_for_token(self):
+        while not self._stop.is_set():
+            wait = self._bucket.consume()
+            if not wait:
+                return
+            self._stop.wait(wait)
+
+    def _check(self, row):
+        registry_id, filename, sha256, ipfs_url = row
+        ipfs_status, chain_status, detail = check_record(
+            sha256, ipfs_url, self.fetch_metadata, self.verify_anchor
+        )
+        return registry_id, filename, sha256, ipfs_status, chain_status, detail
+
+    def audit_batch(self):
+        """Checks the next batch after the cursor. Returns True once a full pass is complete."""
+        conn = self._connect()
+        try:
+            last_id, passes = self._cursor(conn)
+            rows = conn.execute(
+                "SELECT id, filename, sha256, ipfs_url FROM registry WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, self.batch_size),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        if not rows:
+            # End of the table: wrap the cursor so the next pass starts from the top
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO audit_cursor (name, last_id, passes, updated_at) VALUES (?, 0, ?, ?)",
+                        (CURSOR_NAME, passes + (1 if last_id else 0), _now()),
+                    )
+            finally:
+                conn.close()
+            return True
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = []
+            for row in rows:
+                self._wait_for_token()
+                if self._stop.is_set():
+                    break
+                futures.append(pool.submit(self._check, row))
+            results = [f.result() for f in futures]
+        if not results:
+            return False
+        verdicts = [verdict(r[3], r[4]) for r in results]
+        asked_gateway = [r[3] for r in results if r[3] != MISSING]
+        chain_down = all(r[4] == UNAVAILABLE for r in results)
+        gateway_down = bool(asked_gateway) and all(status == UNAVAILABLE for status in asked_gateway)
+        if (chain_down or gateway_down) and self._outage_retries < MAX_OUTAGE_RETRIES:
+            # Keep the cursor so these records are checked again once it is back
+            self._outage_retries += 1
+            detail = next((r[5] for r in results if r[5]), "")
+            raise CheckerUnavailable(f"{'Chain' if chain_down else 'IPFS gateway'} unavailable. {detail}")
+        self._outage_retries = 0
+
+        checked_at = _now()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO registry_audit
+                        (registry_id, filename, sha256, ipfs_status, chain_status, ok, detail, checked_at, first_failed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, CASE WHEN ? = 0 THEN ? END)
+                    ON CONFLICT(registry_id) DO UPDATE SET
+                        filename = excluded.filename,
+                        sha256 = excluded.sha256,
+                        ipfs_status = excluded.ipfs_status,
+                        chain_status = excluded.chain_status,
+                        ok = excluded.ok,
+                        detail = excluded.detail,
+                        checked_at = excluded.checked_at,
+                        first_failed_at = CASE
+                            WHEN excluded.ok = 0 THEN COALESCE(registry_audit.first_failed_at, excluded.checked_at)
+                            WHEN excluded.ok = 1 THEN NULL
+                            ELSE registry_audit.first_failed_at END
+                    """,
+                    [
+                        (rid, name, sha, ipfs, chain, ok, detail, checked_at, ok, checked_at)
+                        for (rid, name, sha, ipfs, chain, detail), ok in zip(results, verdicts)
+                    ],
+                )
+                # Cursor moves only past records whose results were saved with it
+                conn.execute(
+                    "INSERT OR REPLACE INTO audit_cursor (name, last_id, passes, updated_at) VALUES (?, ?, ?, ?)",
+                    (CURSOR_NAME, results[-1][0], passes, checked_at),
+                )
+        finally:
+            conn.close()
+        self.checked_count += len(results)
+        return False
+
+    # --- Reporting ---
+    def summary(self, limit=10):
+        """Audit progress and the most recent failing records, for the dashboard."""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            last_id, passes = self._cursor(conn)
+            audited, failing, inconclusive = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(ok = 0), 0), COALESCE(SUM(ok IS NULL), 0) FROM registry_audit"
+            ).fetchone()
+            findings = [
+                dict(row)
+                for row in conn.execute(
+                    """
+                    SELECT registry_id, filename, sha256, ipfs_status, chain_status, detail,
+                           checked_at, first_failed_at
+                    FROM registry_audit WHERE ok = 0 ORDER BY checked_at DESC, registry_id DESC LIMIT ?
+                    """,
+                    (limit,),
+                )
+            ]
+        finally:
+            conn.close()
+        return {
+            "audited": audited,
+            "failing": failing,
+            "inconclusive": inconclusive,
+            "passes": passes,
+            "cursor": last_id,
+            "findings": findings,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-check registry records against IPFS and the chain.")
+    parser.add_argument("--db", default="file_registry.db", help="SQLite database file")
+    parser.add_argument("--rate", type=float, default=AUDIT_RATE, help="records per second")
+    parser.add_argument("--concurrency", type=int, default=AUDIT_CONCURRENCY)
+    parser.add_argument("--once", action="store_true", help="run to the end of the table, then exit")
+    args = parser.parse_args(argv)
+
+    from blockchain import verify_on_chain
+    from storage import request_ipfs_metadata
+
+    auditor = IntegrityAuditor(
+        args.db, request_ipfs_metadata, verify_on_chain, rate=args.rate, concurrency=args.concurrency
+    )
+    if args.once:
+        try:
+            auditor.run_pass()
+        except CheckerUnavailable as e:
+            print(f"Audit stopped, checker unavailable: {e}", file=sys.stderr)
+            return 2
+    else:
+        try:
+            auditor.run_forever()
+        except KeyboardInterrupt:
+            pass
+
+    summary = auditor.summary()
+    print(
+        f"{auditor.checked_count} records checked, {summary['failing']} of {summary['audited']} failing, "
+        f"{summary['inconclusive']} inconclusive."
+    )
+    for f in summary["findings"]:
+        print(f"#{f['registry_id']} {f['filename']}: ipfs={f['ipfs_status']} chain={f['chain_status']}"
+              + (f" ({f['detail']})" if f["detail"] else ""))
+    return 1 if summary["failing"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# In-process event bus used to push live dashboard updates over Server-Sent Events.
+#
+# A single DashboardWatcher thread polls the slow sources (RPC block height,
+# node statuses) and publishes only the changes; every connected browser gets
+# its own small queue fed from that one fan-out instead of polling the backend.
+
+import json
+import queue
+import threading
+import time
+
+SUBSCRIBER_QUEUE_SIZE = 100  # Events buffered per viewer before it is dropped
+KEEPALIVE_SECONDS = 15
+RECONNECT_MS = 3000  # Browser EventSource retry delay after a dropped connection
+WATCH_INTERVAL_SECONDS = 3
+MAX_NODE_EVENTS_PER_POLL = 50  # Above this, viewers get one summary instead of a flood
+
+
+class EventBus:
+    """Fan-out of published events to every subscriber queue."""
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._last_id = 0
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def last_id(self):
+        """Id of the most recently published event (0 if none yet)."""
+        with self._lock:
+            return self._last_id
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        """Delivers an event to all subscribers without ever blocking the publisher."""
+        with self._lock:
+            self._last_id += 1
+            event = {"id": self._last_id, "type": event_type, "data": data}
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # A viewer that stopped reading is disconnected; its EventSource
+                # reconnects and the snapshot sent on connect resyncs the page.
+                self.unsubscribe(q)
+                try:
+                    q.get_nowait()
+                    q.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+        return event
+
+
+def format_sse(event):
+    """Serializes an event dict into the text/event-stream wire format."""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def stream_events(bus, initial_events=()):
+    """Generator for an SSE response. Unsubscribes when the client disconnects.
+
+    initial_events may be a callable; it is called only after subscribing, so
+    nothing published between the snapshot and the live stream is lost.
+    """
+    q = bus.subscribe()
+    try:
+        if callable(initial_events):
+            initial_events = initial_events()
+        yield f"retry: {RECONNECT_MS}\n\n"
+        for event in initial_events:
+            yield format_sse(event)
+        while True:
+            try:
+                event = q.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                break
+            yield format_sse(event)
+    finally:
+        bus.unsubscribe(q)
+
+
+class DashboardWatcher:
+    """Background poller that publishes block-height and node-status changes.
+
+    get_block_number: callable returning the display string for the current block.
+    get_node_statuses: callable returning a {node_id: status} dict.
+    get_node_summary: optional callable returning {status: count} aggregates.
+    Polling only happens while at least one viewer is subscribed.
+    """
+
+    def __init__(
+        self,
+        bus,
+        get_block_number,
+        get_node_statuses,
+        get_node_summary=None,
+        interval=WATCH_INTERVAL_SECONDS,
+    ):
+        self.bus = bus
+        self.get_block_number = get_block_number
+        self.get_node_statuses = get_node_statuses
+        self.get_node_summary = get_node_summary
+        self.interval = interval
+        self.current_block = None
+        self.block_checked_at = 0.0
+        self._node_status = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="dashboard-watcher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def cached_block_number(self, max_age=None):
+        """Last polled block string, or None if it is missing or older than max_age."""
+        if max_age is None:
+            max_age = self.interval * 2
+        if self.current_block is None or time.time() - self.block_checked_at > max_age:
+            return None
+        return self.current_block
+
+    def snapshot_events(self, state=None):
+        """Events describing the current state, sent to a viewer when it (re)connects.
+
+        state: optional dict with the rest of the dashboard (counters, activity,
+        node statuses), sent as one "snapshot" event.
+        """
+        events = []
+        if self.current_block is not None:
+            events.append({"id": 0, "type": "block", "data": {"current_block": self.current_block}})
+        if state is not None:
+            events.append({"id": 0, "type": "snapshot", "data": state})
+        return events
+
+    def poll_once(self):
+        try:
+            block = self.get_block_number()
+        except Exception as e:
+            print(f"Warning: dashboard watcher could not read block: {e}")
+            block = "Error"
+        self.block_checked_at = time.time()
+        if block != self.current_block:
+            self.current_block = block
+            self.bus.publish("block", {"current_block": block})
+
+        try:
+            status = self.get_node_statuses()
+        except Exception as e:
+            print(f"Warning: dashboard watcher could not read nodes: {e}")
+            return
+        if self._node_status is not None:
+            changed = [
+                (node_id, node_status)
+                for node_id, node_status in status.items()
+                if self._node_status.get(node_id) != node_status
+            ]
+            if len(changed) <= MAX_NODE_EVENTS_PER_POLL:
+                for node_id, node_status in changed:
+                    self.bus.publish("node", {"id": node_id, "status": node_status})
+            if changed and self.get_node_summary:
+                summary = self.get_node_summary()
+                summary["total"] = len(status)
+                self.bus.publish("node_summary", summary)
+        self._node_status = status
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.bus.subscriber_count() > 0:
+                self.poll_once()
+            self._stop.wait(self.interval)
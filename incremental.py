@@ -0,0 +1,434 @@
+# Incremental anchoring for append-only datasets.
+#
+# A dataset is split into fixed-size chunks (the last one may be partial) and
+# committed to with a Merkle mountain range (MMR):
+#   leaf  = sha256(0x00 || chunk bytes)
+#   node  = sha256(0x01 || left || right)
+#   root  = peaks "bagged" right to left: node(p1, node(p2, ... node(pk-1, pk)))
+# The accumulator state for a version is just its size and the MMR peaks over
+# its complete chunks, so appending only hashes the new bytes (plus the old
+# partial tail chunk, which is at most one chunk). A prefix proof lets anyone
+# holding only the two roots check that version N is a prefix of version M.
+#
+# Server-side layout under DATASETS_FOLDER:
+#   <name>.dat      the dataset bytes, append-only
+#   <name>.leaves   32-byte leaf hashes of every complete chunk, used to build proofs
+# Version records (size, peaks, root, anchoring info) live in the
+# `dataset_versions` table.
+
+import base64
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+DATASETS_FOLDER = "datasets"
+CHUNK_SIZE = int(os.getenv("DATASET_CHUNK_SIZE", str(64 * 1024)))
+DATASET_NAME_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,100}$")
+HASH_SIZE = 32
+
+
+# --- Hashing Primitives ---
+def leaf_hash(chunk):
+    return hashlib.sha256(b"\x00" + chunk).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def bag_peaks(hashes):
+    """Folds peak hashes (left to right) into a single root."""
+    root = hashes[-1]
+    for peak in reversed(hashes[:-1]):
+        root = node_hash(peak, root)
+    return root
+
+
+def peak_ranges(leaf_count):
+    """Aligned (start, height) subtrees that make up an MMR of leaf_count leaves."""
+    ranges = []
+    start = 0
+    for height in range(leaf_count.bit_length() - 1, -1, -1):
+        if leaf_count & (1 << height):
+            ranges.append((start, height))
+            start += 1 << height
+    return ranges
+
+
+class MerkleMountainRange:
+    """Append-only list of peaks, each a (height, hash) pair."""
+
+    def __init__(self, peaks=None):
+        self.peaks = list(peaks or [])
+
+    @property
+    def leaf_count(self):
+        return sum(1 << height for height, _ in self.peaks)
+
+    def append(self, leaf):
+        self.peaks.append((0, leaf))
+        while len(self.peaks) >= 2 and self.peaks[-1][0] == self.peaks[-2][0]:
+            height, right = self.peaks.pop()
+            _, left = self.peaks.pop()
+            self.peaks.append((height + 1, node_hash(left, right)))
+
+    def root(self, tail_leaf=None):
+        hashes = [h for _, h in self.peaks]
+        if tail_leaf is not None:
+            hashes.append(tail_leaf)
+        if not hashes:
+            return leaf_hash(b"")
+        return bag_peaks(hashes)
+
+
+def peaks_to_json(peaks):
+    return [[height, h.hex()] for height, h in peaks]
+
+
+def peaks_from_json(data):
+    return [(int(height), bytes.fromhex(h)) for height, h in data]
+
+
+def dataset_root(data, chunk_size=CHUNK_SIZE):
+    """Root of a complete byte string, computed from scratch (for verifiers holding the file)."""
+    mmr = MerkleMountainRange()
+    full = len(data) // chunk_size
+    for i in range(full):
+        mmr.append(leaf_hash(data[i * chunk_size : (i + 1) * chunk_size]))
+    tail = data[full * chunk_size :]
+    return mmr.root(leaf_hash(tail) if tail else None).hex()
+
+
+def file_root(file_path, chunk_size=CHUNK_SIZE):
+    """Root of a file on disk, read one chunk at a time."""
+    mmr = MerkleMountainRange()
+    tail_leaf = None
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            if len(chunk) == chunk_size:
+                mmr.append(leaf_hash(chunk))
+            else:
+                tail_leaf = leaf_hash(chunk)
+    return mmr.root(tail_leaf).hex()
+
+
+# --- Prefix Proofs ---
+def _walk(start, height, known, boundary, resolve):
+    """Computes the hash of subtree (start, height).
+
+    Subtrees in `known` are taken as given; subtrees entirely at or beyond
+    `boundary` come from resolve(start, height); anything else is split.
+    Prover and verifier share this traversal so proof hashes line up.
+    """
+    if (start, height) in known:
+        return known[(start, height)]
+    if start >= boundary:
+        return resolve(start, height)
+    if height == 0:
+        raise ValueError(f"Proof is missing leaf {start}.")
+    half = 1 << (height - 1)
+    return node_hash(
+        _walk(start, height - 1, known, boundary, resolve),
+        _walk(start + half, height - 1, known, boundary, resolve),
+    )
+
+
+def _known_subtrees(old_peaks, bridge_leaf):
+    known = {}
+    start = 0
+    for height, h in old_peaks:
+        known[(start, height)] = h
+        start += 1 << height
+    boundary = start
+    if bridge_leaf is not None:
+        known[(start, 0)] = bridge_leaf
+        boundary += 1
+    return known, boundary
+
+
+def verify_prefix_proof(proof, old_root, new_root):
+    """Checks that the version with `old_root` is a byte prefix of the one with `new_root`.
+
+    Needs only the proof (old peaks, at most two partial chunks and a few
+    hashes) -- neither version of the dataset itself.
+    """
+    try:
+        chunk_size = int(proof["chunk_size"])
+        old_size = int(proof["old_size"])
+        new_size = int(proof["new_size"])
+        old_peaks = peaks_from_json(proof["old_peaks"])
+        tail = base64.b64decode(proof.get("tail") or "")
+        bridge = base64.b64decode(proof.get("bridge_chunk") or "")
+        hashes = [bytes.fromhex(h) for h in proof["hashes"]]
+    except (KeyError, TypeError, ValueError):
+        return False
+
+    full = old_size // chunk_size
+    if new_size < old_size or len(tail) != old_size % chunk_size:
+        return False
+    if peak_ranges(full) != [
+        (sum(1 << h for h, _ in old_peaks[:i]), h) for i, (h, _) in enumerate(old_peaks)
+    ]:
+        return False
+
+    # 1. The old root must follow from its peaks and tail bytes
+    old_mmr = MerkleMountainRange(old_peaks)
+    if old_mmr.root(leaf_hash(tail) if tail else None).hex() != old_root:
+        return False
+
+    # 2. The chunk that held the old tail must start with those exact bytes
+    bridge_leaf = None
+    if tail:
+        expected_len = min(chunk_size, new_size - full * chunk_size)
+        if len(bridge) != expected_len or not bridge.startswith(tail):
+            return False
+        bridge_leaf = leaf_hash(bridge)
+
+    # 3. Rebuild the new root from the shared prefix plus the supplied subtrees
+    known, boundary = _known_subtrees(old_peaks, bridge_leaf)
+    supplied = iter(hashes)
+
+    def resolve(start, height):
+        try:
+            return next(supplied)
+        except StopIteration:
+            raise ValueError("Proof has too few hashes.")
+
+    new_leaves = -(-new_size // chunk_size)
+    try:
+        peaks = [_walk(s, h, known, boundary, resolve) for s, h in peak_ranges(new_leaves)]
+    except ValueError:
+        return False
+    if next(supplied, None) is not None:
+        return False
+    return bool(peaks) and bag_peaks(peaks).hex() == new_root
+
+
+# --- Server-Side Dataset Store ---
+def ensure_dataset_versions_table_exists(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dataset_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dataset TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            peaks TEXT NOT NULL,
+            root TEXT NOT NULL,
+            ipfs_url TEXT,
+            tx_hash TEXT,
+            timestamp TEXT,
+            UNIQUE (dataset, version)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+class DatasetStore:
+    """Keeps append-only datasets on disk and their anchored versions in SQLite."""
+
+    def __init__(self, db_path, base_dir=DATASETS_FOLDER, chunk_size=CHUNK_SIZE):
+        self.db_path = db_path
+        self.base_dir = base_dir
+        self.chunk_size = chunk_size
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, name):
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _paths(self, name):
+        if not DATASET_NAME_PATTERN.match(name or ""):
+            raise ValueError("Invalid dataset name.")
+        base = os.path.join(self.base_dir, name)
+        return base + ".dat", base + ".leaves"
+
+    def _row_to_version(self, row):
+        return {
+            "dataset": row[0],
+            "version": row[1],
+            "size": row[2],
+            "chunk_size": row[3],
+            "peaks": json.loads(row[4]),
+            "root": row[5],
+            "ipfs_url": row[6],
+            "tx_hash": row[7],
+            "timestamp": row[8],
+        }
+
+    def versions(self, name):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT dataset, version, size, chunk_size, peaks, root, ipfs_url, tx_hash, timestamp
+               FROM dataset_versions WHERE dataset = ? ORDER BY version""",
+            (name,),
+        )
+        rows = cursor.fetchall()
+        conn.close()
+        return [self._row_to_version(row) for row in rows]
+
+    def get_version(self, name, version):
+        for v in self.versions(name):
+            if v["version"] == version:
+                return v
+        return None
+
+    def append(self, name, data, anchor):
+        """Appends bytes to a dataset and anchors the new version.
+
+        anchor(name, version, size, chunk_size, root, previous_root) must pin
+        and anchor the root and return (ipfs_url, tx_hash). chunk_size is the
+        dataset's own, fixed at its first version. anchor runs before the version is
+        recorded, so a failed anchor leaves the previous version current.
+        """
+        if not data:
+            raise ValueError("Nothing to append.")
+        data_path, leaves_path = self._paths(name)
+        os.makedirs(self.base_dir, exist_ok=True)
+
+        with self._lock(name):
+            history = self.versions(name)
+            latest = history[-1] if history else None
+            chunk_size = latest["chunk_size"] if latest else self.chunk_size
+            old_size = latest["size"] if latest else 0
+            full = old_size // chunk_size
+            mmr = MerkleMountainRange(peaks_from_json(latest["peaks"]) if latest else [])
+
+            # Drop bytes left behind by an append whose anchoring failed
+            with open(data_path, "ab") as f:
+                f.truncate(old_size)
+            with open(leaves_path, "ab") as f:
+                f.truncate(full * HASH_SIZE)
+
+            # Only the old partial tail and the new bytes are hashed
+            with open(data_path, "rb") as f:
+                f.seek(full * chunk_size)
+                pending = f.read() + data
+            new_leaves = []
+            offset = 0
+            while len(pending) - offset >= chunk_size:
+                leaf = leaf_hash(pending[offset : offset + chunk_size])
+                mmr.append(leaf)
+                new_leaves.append(leaf)
+                offset += chunk_size
+            tail = pending[offset:]
+
+            with open(data_path, "ab") as f:
+                f.write(data)
+            with open(leaves_path, "ab") as f:
+                f.write(b"".join(new_leaves))
+
+            size = old_size + len(data)
+            root = mmr.root(leaf_hash(tail) if tail else None).hex()
+            version = latest["version"] + 1 if latest else 1
+            ipfs_url, tx_hash = anchor(
+                name, version, size, chunk_size, root, latest["root"] if latest else None
+            )
+
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(
+                """INSERT INTO dataset_versions
+                   (dataset, version, size, chunk_size, peaks, root, ipfs_url, tx_hash, timestamp)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))""",
+                (name, version, size, chunk_size, json.dumps(peaks_to_json(mmr.peaks)), root, ipfs_url, tx_hash),
+            )
+            conn.commit()
+            conn.close()
+        return self.get_version(name, version)
+
+    def prefix_proof(self, name, old_version, new_version):
+        """Builds a proof that old_version's bytes are a prefix of new_version's."""
+        old = self.get_version(name, old_version)
+        new = self.get_version(name, new_version)
+        if old is None or new is None:
+            raise ValueError("Unknown dataset version.")
+        if old_version > new_version:
+            raise ValueError("old version must not be newer than new version.")
+        data_path, leaves_path = self._paths(name)
+        chunk_size = new["chunk_size"]
+        full = old["size"] // chunk_size
+        new_full = new["size"] // chunk_size
+
+        with open(data_path, "rb") as data_file, open(leaves_path, "rb") as leaves_file:
+
+            def read_bytes(start, end):
+                data_file.seek(start)
+                return data_file.read(end - start)
+
+            def leaf_at(index):
+                if index < new_full:
+                    leaves_file.seek(index * HASH_SIZE)
+                    return leaves_file.read(HASH_SIZE)
+                # The new version's own partial tail chunk
+                return leaf_hash(read_bytes(index * chunk_size, new["size"]))
+
+            def subtree(start, height):
+                if height == 0:
+                    return leaf_at(start)
+                half = 1 << (height - 1)
+                return node_hash(subtree(start, height - 1), subtree(start + half, height - 1))
+
+            hashes = []
+
+            def resolve(start, height):
+                h = subtree(start, height)
+                hashes.append(h.hex())
+                return h
+
+            tail = read_bytes(full * chunk_size, old["size"])
+            bridge = b""
+            bridge_leaf = None
+            if tail:
+                bridge = read_bytes(full * chunk_size, min((full + 1) * chunk_size, new["size"]))
+                bridge_leaf = leaf_hash(bridge)
+            known, boundary = _known_subtrees(peaks_from_json(old["peaks"]), bridge_leaf)
+            new_leaves = -(-new["size"] // chunk_size)
+            for start, height in peak_ranges(new_leaves):
+                _walk(start, height, known, boundary, resolve)
+
+        return {
+            "dataset": name,
+            "chunk_size": chunk_size,
+            "old_version": old_version,
+            "new_version": new_version,
+            "old_size": old["size"],
+            "new_size": new["size"],
+            "old_root": old["root"],
+            "new_root": new["root"],
+            "old_peaks": old["peaks"],
+            "tail": base64.b64encode(tail).decode(),
+            "bridge_chunk": base64.b64encode(bridge).decode(),
+            "hashes": hashes,
+        }
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python incremental.py root <file> [--chunk-size N]     -> MMR root of a local file
+    #   python incremental.py verify <proof.json> <old_root> <new_root>
+    if len(sys.argv) in (3, 5) and sys.argv[1] == "root":
+        chunk_size = CHUNK_SIZE
+        if len(sys.argv) == 5:
+            # Use the chunk_size recorded with the version being compared against
+            if sys.argv[3] != "--chunk-size" or not sys.argv[4].isdigit() or int(sys.argv[4]) <= 0:
+                print("--chunk-size must be a positive integer")
+                sys.exit(2)
+            chunk_size = int(sys.argv[4])
+        print(file_root(sys.argv[2], chunk_size))
+    elif len(sys.argv) == 5 and sys.argv[1] == "verify":
+        with open(sys.argv[2]) as f:
+            ok = verify_prefix_proof(json.load(f), sys.argv[3], sys.argv[4])
+        print("VALID: old version is a prefix of new version" if ok else "INVALID proof")
+        sys.exit(0 if ok else 1)
+    else:
+        print("Usage: python incremental.py root <file> [--chunk-size N] | verify <proof.json> <old_root> <new_root>")
+        sys.exit(2)
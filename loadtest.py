@@ -0,0 +1,408 @@
+# Load-testing harness for the Flask app.
+#
+# Runs the real app in-process behind a threaded WSGI server, with local
+# stand-ins for everything external:
+#   - a mock Pinata pinning API and IPFS gateway (one local HTTP server),
+#   - an in-process test chain (web3's EthereumTesterProvider with the
+#     DataAnchor contract from deploy.py deployed), or a plain stub when
+#     eth-tester isn't installed (pip install "web3[tester]").
+# Worker threads then drive a weighted mix of uploads, verifications, oracle
+# verifications and dashboard hits at each concurrency level, and the script
+# prints throughput, p50/p95/p99 latency and error rates as JSON.
+#
+# Usage:
+#   python loadtest.py --concurrency 1,8,32 --duration 20 \
+#       --mix upload=2,verify=3,oracle=4,dashboard=1 --output report.json
+#
+# Everything runs inside a temporary working directory, so the real
+# file_registry.db, uploads/ and telemetry/ folders are never touched.
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+OPERATIONS = ("upload", "verify", "oracle", "dashboard")
+DEFAULT_MIX = "upload=2,verify=3,oracle=4,dashboard=1"
+WARMUP_UPLOADS = 5
+
+
+# --- Local Pinata / IPFS Gateway ---
+class MockIpfsServer:
+    """Pins JSON in memory and serves it back like a gateway."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.pins = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                if self.path != "/pinning/pinJSONToIPFS":
+                    return self._reply(404, {"error": "not found"})
+                length = int(self.headers.get("Content-Length", 0))
+                content = json.loads(self.rfile.read(length))["pinataContent"]
+                cid = "Qm" + hashlib.sha256(
+                    json.dumps(content, sort_keys=True).encode()
+                ).hexdigest()[:44]
+                with server._lock:
+                    server.pins[cid] = content
+                time.sleep(server.latency)
+                self._reply(200, {"IpfsHash": cid, "PinSize": length})
+
+            def do_GET(self):
+                cid = self.path.rsplit("/", 1)[-1]
+                with server._lock:
+                    content = server.pins.get(cid)
+                time.sleep(server.latency)
+                if content is None:
+                    return self._reply(404, {"error": "not pinned"})
+                self._reply(200, content)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+# --- In-Process Chain ---
+def start_test_chain():
+    """Deploys the anchoring contract on an in-process EVM and points blockchain.py at it.
+
+    Returns a short description of the chain that was set up.
+    """
+    import blockchain
+
+    try:
+        from web3 import EthereumTesterProvider, Web3
+    except ImportError:
+        EthereumTesterProvider = None
+    if EthereumTesterProvider is not None:
+        try:
+            provider = EthereumTesterProvider()
+        except Exception:
+            provider = None
+    else:
+        provider = None
+
+    if provider is None:
+        # No eth-tester: stand in for the chain with an in-memory ledger
+        ledger = {}
+        lock = threading.Lock()
+
+        def anchor_on_chain(sha256_hash, ipfs_uri):
+            with lock:
+                if sha256_hash in ledger:
+                    raise ValueError("File already anchored.")
+                ledger[sha256_hash] = ipfs_uri
+                return "0x" + hashlib.sha256(f"{len(ledger)}:{sha256_hash}".encode()).hexdigest()
+
+        blockchain.anchor_on_chain = anchor_on_chain
+        blockchain.verify_on_chain = lambda sha256_hash: sha256_hash in ledger
+        blockchain.w3 = blockchain.web3 = None
+        return "stub (install web3[tester] for an in-process EVM)"
+
+    # py-evm is not thread-safe; serialize every RPC call
+    rpc_lock = threading.Lock()
+    make_request = provider.make_request
+
+    def locked_make_request(method, params):
+        with rpc_lock:
+            return make_request(method, params)
+
+    provider.make_request = locked_make_request
+    w3 = Web3(provider)
+
+    from deploy import CONTRACT_BYTECODE
+
+    account = w3.eth.accounts[0]
+    factory = w3.eth.contract(abi=blockchain.CONTRACT_ABI, bytecode=CONTRACT_BYTECODE)
+    receipt = w3.eth.wait_for_transaction_receipt(factory.constructor().transact({"from": account}))
+
+    blockchain.w3 = blockchain.web3 = w3
+    blockchain.contract = w3.eth.contract(address=receipt.contractAddress, abi=blockchain.CONTRACT_ABI)
+    blockchain.WALLET_ADDRESS = account
+    blockchain.PRIVATE_KEY = provider.ethereum_tester.backend.account_keys[0].to_hex()
+    return f"eth-tester (contract {receipt.contractAddress})"
+
+
+# --- App Under Test ---
+def start_app(ipfs_url):
+    """Imports the app inside the current (temporary) directory and serves it on a free port."""
+    from werkzeug.serving import make_server
+
+    import storage
+
+    storage.PINATA_PIN_URL = f"{ipfs_url}/pinning/pinJSONToIPFS"
+    storage.IPFS_GATEWAY_URL = f"{ipfs_url}/ipfs/"
+
+    import app as app_module
+    import blockchain
+
+    app_module.web3 = blockchain.web3
+    app_module.anchor_on_chain = blockchain.anchor_on_chain
+    app_module.verify_on_chain = blockchain.verify_on_chain
+    # The background audit would hit the mock gateway and chain during measurement
+    app_module.AUDIT_ENABLED = False
+    app_module.integrity_auditor.stop()
+    for ensure in (
+        app_module.ensure_registry_table_exists,
+        app_module.ensure_oracles_table_exists,
+        app_module.node_registry.ensure_table_exists,
+    ):
+        ensure()
+
+    # One oracle with an effectively unthrottled API key for the oracle mix
+    app_module.create_oracle("loadtest@example.org", "Load Test", "lab", "loadtest")
+    app_module.api_key_index.rate = app_module.api_key_index.burst = 1e9
+    api_key = app_module.api_key_index.create_key("loadtest@example.org", "loadtest")
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", api_key
+
+
+# --- Load Generation ---
+def parse_mix(text):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}'. Choose from {', '.join(OPERATIONS)}.")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples, elapsed):
+    """samples: list of (latency seconds, ok, status)."""
+    latencies = sorted(s[0] * 1000 for s in samples)
+    errors = sum(1 for s in samples if not s[1])
+    statuses = {}
+    for _, _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99": round(percentile(latencies, 99), 2) if latencies else None,
+            "max": round(latencies[-1], 2) if latencies else None,
+        },
+        "status_codes": statuses,
+    }
+
+
+class LoadGenerator:
+    def __init__(self, base_url, api_key, mix, file_size, seed=None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.file_size = file_size
+        self.anchored = []  # (content bytes, sha256, ipfs_url) of successful uploads
+        self._anchored_lock = threading.Lock()
+        self._counter = 0
+        self._rng = random.Random(seed)
+
+    def _next_id(self):
+        with self._anchored_lock:
+            self._counter += 1
+            return self._counter
+
+    def _unique_csv(self):
+        # Every upload must be unique: the contract rejects re-anchoring a hash
+        header = f"sample_id,reading,run\n{self._next_id()},0,{time.time_ns()}\n".encode()
+        return header + b"0" * max(0, self.file_size - len(header))
+
+    def _filename(self):
+        # Distinct names, like real users; uploads are saved under their filename
+        return f"load-{self._next_id()}.csv"
+
+    def _pick_anchored(self, rng):
+        with self._anchored_lock:
+            return rng.choice(self.anchored) if self.anchored else None
+
+    def request(self, session, op, rng):
+        """Performs one operation; returns (ok, status)."""
+        if op == "dashboard":
+            resp = session.get(f"{self.base_url}/")
+        elif op == "upload":
+            content = self._unique_csv()
+            resp = session.post(
+                f"{self.base_url}/auto-secure",
+                files={"file": (self._filename(), io.BytesIO(content))},
+            )
+            if resp.status_code == 200:
+                data = resp.json()
+                with self._anchored_lock:
+                    self.anchored.append((content, data["file_hash"], data["ipfs_url"]))
+        else:
+            content, sha, ipfs_url = self._pick_anchored(rng)
+            if op == "verify":
+                resp = session.post(
+                    f"{self.base_url}/verify",
+                    files={"file": (self._filename(), io.BytesIO(content))},
+                    data={"ipfs_url": ipfs_url},
+                )
+            else:
+                resp = session.post(
+                    f"{self.base_url}/oracle/verify",
+                    json={"sha256": sha, "ipfs_url": ipfs_url},
+                    headers={"X-API-Key": self.api_key},
+                )
+        ok = resp.status_code == 200
+        if ok and op in ("verify", "oracle"):
+            ok = bool(resp.json().get("is_valid"))
+        return ok, resp.status_code
+
+    def resolve(self, op):
+        """Verifications need an anchored file; until one exists they run as uploads."""
+        if op in ("verify", "oracle"):
+            with self._anchored_lock:
+                if not self.anchored:
+                    return "upload"
+        return op
+
+    def warm_up(self):
+        session = requests.Session()
+        for _ in range(WARMUP_UPLOADS):
+            self.request(session, "upload", self._rng)
+
+    def run_level(self, concurrency, duration):
+        samples = {op: [] for op in self.ops + ["upload"]}
+        deadline = time.monotonic() + duration
+
+        def worker(seed):
+            rng = random.Random(seed)
+            session = requests.Session()
+            local = {op: [] for op in samples}
+            while time.monotonic() < deadline:
+                # Resolve first, so a stand-in upload is recorded as an upload
+                op = self.resolve(rng.choices(self.ops, self.weights)[0])
+                started = time.perf_counter()
+                try:
+                    ok, status = self.request(session, op, rng)
+                except requests.RequestException as e:
+                    ok, status = False, type(e).__name__
+                local[op].append((time.perf_counter() - started, ok, status))
+            for op, values in local.items():
+                samples[op].extend(values)
+
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=worker, args=(self._rng.random(),)) for _ in range(concurrency)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+
+        report = {"concurrency": concurrency, "duration_s": round(elapsed, 2)}
+        report.update(summarize([s for values in samples.values() for s in values], elapsed))
+        report["by_operation"] = {
+            op: summarize(values, elapsed)
+            for op, values in samples.items()
+            if values or op in self.ops
+        }
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the De-Science Ledger app with local stand-ins.")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights, e.g. upload=1,oracle=5")
+    parser.add_argument("--file-size", type=int, default=64 * 1024, help="upload size in bytes")
+    parser.add_argument("--ipfs-latency", type=float, default=0.0, help="mock Pinata/gateway delay (s)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    output = os.path.abspath(args.output) if args.output else None
+    sys.path.insert(0, source_dir)
+
+    workdir = tempfile.mkdtemp(prefix="dsl-loadtest-")
+    os.chdir(workdir)
+    ipfs = MockIpfsServer(args.ipfs_latency)
+
+    # The app logs every upload; keep that chatter out of the JSON report
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        chain = start_test_chain()
+        server, base_url, api_key = start_app(ipfs.url)
+        generator = LoadGenerator(base_url, api_key, mix, args.file_size, args.seed)
+        generator.warm_up()
+        results = []
+        for level in levels:
+            print(f"Running {level} workers for {args.duration}s...", file=sys.stderr)
+            results.append(generator.run_level(level, args.duration))
+        server.shutdown()
+        ipfs.stop()
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    report = {
+        "config": {
+            "concurrency": levels,
+            "duration_s": args.duration,
+            "mix": mix,
+            "file_size": args.file_size,
+            "ipfs_latency_s": args.ipfs_latency,
+            "chain": chain,
+            "workdir": workdir,
+        },
+        "levels": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
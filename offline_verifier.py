@@ -0,0 +1,222 @@
+# Offline bulk verifier: checks a whole folder of datasets against a compact
+# snapshot of the registry, with no network, IPFS or chain access.
+#
+# The snapshot is one binary file:
+#   header   magic "DSLIDX1\0", digest count (u64), bloom size in bits (u64), hash count (u32)
+#   bloom    Bloom filter over all digests, rejects most unknown files in O(1)
+#   digests  raw 32-byte SHA-256 digests, sorted, for exact binary-search lookups
+# It is memory-mapped when verifying, so opening it costs nothing up front and
+# each record takes ~33 bytes on disk.
+#
+# Usage:
+#   python offline_verifier.py build registry.idx [--db file_registry.db | --from-export registry.jsonl.gz]
+#       (the export may also be CSV: registry.csv or registry.csv.gz)
+#   python offline_verifier.py verify registry.idx ./datasets [--json] [--workers 8]
+
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+MAGIC = b"DSLIDX1\x00"
+HEADER = struct.Struct("<8sQQI")
+DIGEST_SIZE = 32
+BLOOM_BITS_PER_DIGEST = 10  # ~1% false positives with 7 hashes
+BLOOM_HASHES = 7
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _bloom_positions(digest, bits, hashes):
+    # Digests are already uniformly random, so slice them instead of rehashing
+    h1 = int.from_bytes(digest[0:8], "little")
+    h2 = int.from_bytes(digest[8:16], "little") | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+# --- Building the Snapshot ---
+def digests_from_db(db_path):
+    """Reads sha256 values of anchored records (those with a tx hash) from the registry."""
+    conn = sqlite3.connect(db_path)
+    try:
+        for (sha,) in conn.execute(
+            "SELECT sha256 FROM registry WHERE sha256 IS NOT NULL AND tx_hash IS NOT NULL AND tx_hash != ''"
+        ):
+            yield sha
+    finally:
+        conn.close()
+
+
+def digests_from_export(export_path):
+    """Reads sha256 values of anchored records from a registry_export.py file.
+
+    JSONL or CSV (by a .csv / .csv.gz name), optionally gzipped. Records
+    without a tx hash were never anchored and are skipped, as in digests_from_db.
+    """
+    compressed = export_path.endswith(".gz")
+    base_name = export_path[:-3] if compressed else export_path
+    opener = gzip.open if compressed else open
+    with opener(export_path, "rt", newline="") as f:
+        if base_name.endswith(".csv"):
+            records = csv.DictReader(f)
+            if not records.fieldnames or "sha256" not in records.fieldnames or "tx_hash" not in records.fieldnames:
+                raise ValueError(f"{export_path}: CSV export must have sha256 and tx_hash columns.")
+        else:
+            records = _jsonl_records(f, export_path)
+        for record in records:
+            if record.get("tx_hash"):
+                yield record.get("sha256")
+
+
+def _jsonl_records(f, export_path):
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise ValueError(
+                f"{export_path}:{line_number}: not a JSONL export (name CSV exports .csv or .csv.gz)."
+            ) from None
+
+
+def build_index(hex_digests, out_path):
+    """Writes a snapshot file from an iterable of hex SHA-256 strings. Returns the digest count."""
+    digests = set()
+    for value in hex_digests:
+        try:
+            digest = bytes.fromhex(value or "")
+        except ValueError:
+            continue
+        if len(digest) == DIGEST_SIZE:
+            digests.add(digest)
+    digests = sorted(digests)
+
+    bits = max(64, len(digests) * BLOOM_BITS_PER_DIGEST)
+    bloom = bytearray((bits + 7) // 8)
+    for digest in digests:
+        for pos in _bloom_positions(digest, bits, BLOOM_HASHES):
+            bloom[pos >> 3] |= 1 << (pos & 7)
+
+    with open(out_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(digests), bits, BLOOM_HASHES))
+        f.write(bloom)
+        for digest in digests:
+            f.write(digest)
+    return len(digests)
+
+
+# --- Looking Up Digests ---
+class DigestIndex:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.bits, self.hashes = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a registry snapshot.")
+        self._bloom_offset = HEADER.size
+        self._digests_offset = self._bloom_offset + (self.bits + 7) // 8
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _digest_at(self, i):
+        start = self._digests_offset + i * DIGEST_SIZE
+        return self._map[start : start + DIGEST_SIZE]
+
+    def might_contain(self, digest):
+        for pos in _bloom_positions(digest, self.bits, self.hashes):
+            if not self._map[self._bloom_offset + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __contains__(self, digest):
+        if not self.might_contain(digest):
+            return False
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._digest_at(mid) < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < self.count and self._digest_at(lo) == digest
+
+
+# --- Verifying a Folder ---
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").digest()
+
+
+def iter_files(folder):
+    for root, _, names in os.walk(folder):
+        for name in sorted(names):
+            yield os.path.join(root, name)
+
+
+def verify_folder(index, folder, workers=HASH_WORKERS):
+    """Hashes every file under folder in parallel; yields (path, sha256 hex, anchored)."""
+    paths = list(iter_files(folder))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, digest in zip(paths, pool.map(hash_file, paths)):
+            yield path, digest.hex(), digest in index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline bulk verification against a registry snapshot.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="build a snapshot from the registry")
+    build.add_argument("index", help="snapshot file to write")
+    source = build.add_mutually_exclusive_group()
+    source.add_argument("--db", default="file_registry.db", help="SQLite registry to read")
+    source.add_argument(
+        "--from-export", help="JSONL or CSV export (see registry_export.py) to read instead; may be gzipped"
+    )
+
+    verify = sub.add_parser("verify", help="check every file in a folder")
+    verify.add_argument("index", help="snapshot file built with 'build'")
+    verify.add_argument("folder", help="folder of datasets to check")
+    verify.add_argument("--workers", type=int, default=HASH_WORKERS)
+    verify.add_argument("--json", action="store_true", help="print one JSON object per file")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        source = digests_from_export(args.from_export) if args.from_export else digests_from_db(args.db)
+        try:
+            count = build_index(source, args.index)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Wrote {count} digests to {args.index} ({os.path.getsize(args.index)} bytes).")
+        return 0
+
+    index = DigestIndex(args.index)
+    checked = missing = 0
+    try:
+        for path, sha, anchored in verify_folder(index, args.folder, args.workers):
+            checked += 1
+            missing += not anchored
+            if args.json:
+                print(json.dumps({"file": path, "sha256": sha, "anchored": anchored}))
+            else:
+                print(f"{'OK     ' if anchored else 'MISSING'}  {sha}  {path}")
+    finally:
+        index.close()
+    if not args.json:
+        print(f"\n{checked} files checked, {checked - missing} anchored, {missing} not in registry.")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,29 @@
-# This file defines the hardcoded list of trusted research nodes active in the network.
+# Registry of trusted research nodes (eDNA sensors, satellites, buoys...) active in the network.
+# Nodes are stored in the `nodes` table of file_registry.db and report liveness by
+# sending batched heartbeats. Current status lives in an in-memory table; a node
+# that hasn't sent a heartbeat within NODE_TTL_SECONDS is reported as Offline.
 # In a fully decentralized production system, this data might come from a
 # Decentralized Autonomous Organization (DAO) registry contract on-chain.
 
+import bisect
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DATABASE_FILE = "file_registry.db"
+NODE_TTL_SECONDS = int(os.getenv("NODE_TTL_SECONDS", "300"))
+NODE_STATUSES = ("Verified", "Syncing", "Offline")
+REPORTABLE_STATUSES = ("Verified", "Syncing")  # What a live node may claim in a heartbeat
+# Node ids double as folder names (e.g. telemetry/<node_id>/), so "." and ".." are refused
+NODE_ID_PATTERN = re.compile(r"(?!\.+\Z)[A-Za-z0-9._-]{1,64}")
+
+
+def is_valid_node_id(node_id):
+    return bool(NODE_ID_PATTERN.fullmatch(node_id or ""))
+
+# Seed data used to populate an empty registry on first start.
 VERIFIED_NODES = [
     {
         "id": "A-101",
@@ -36,11 +58,205 @@ VERIFIED_NODES = [
 ]
 
 
-def get_registered_nodes():
-    """Returns the list of verified nodes."""
-    return VERIFIED_NODES
+class NodeRegistry:
+    """SQLite-backed node list with an in-memory, TTL-expiring status table."""
+
+    def __init__(self, db_path, ttl=NODE_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._nodes = None  # node_id -> dict(id, type, location, reported, last_seen)
+        self._sorted_ids = []
+        self._lock = threading.Lock()
+
+    def ensure_table_exists(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                id TEXT PRIMARY KEY,
+                type TEXT,
+                location TEXT,
+                last_status TEXT,
+                last_seen REAL,
+                registered_at TEXT
+            )
+        """)
+        cursor.execute("SELECT COUNT(*) FROM nodes")
+        if cursor.fetchone()[0] == 0:
+            cursor.executemany(
+                "INSERT INTO nodes (id, type, location, registered_at) VALUES (?, ?, ?, datetime('now'))",
+                [(n["id"], n["type"], n["location"]) for n in VERIFIED_NODES],
+            )
+        conn.commit()
+        conn.close()
+
+    def _load(self):
+        self.ensure_table_exists()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, type, location, last_status, last_seen FROM nodes")
+        nodes = {
+            row[0]: {
+                "id": row[0],
+                "type": row[1],
+                "location": row[2],
+                "reported": row[3] or "Verified",
+                "last_seen": row[4],
+            }
+            for row in cursor.fetchall()
+        }
+        conn.close()
+        self._sorted_ids = sorted(nodes)
+        self._nodes = nodes
+
+    def _table(self):
+        if self._nodes is None:
+            with self._lock:
+                if self._nodes is None:
+                    self._load()
+        return self._nodes
+
+    def _status(self, node, now):
+        if node["last_seen"] is None or now - node["last_seen"] > self.ttl:
+            return "Offline"
+        return node["reported"]
+
+    def _public(self, node, now):
+        return {
+            "id": node["id"],
+            "type": node["type"],
+            "location": node["location"],
+            "status": self._status(node, now),
+        }
+
+    def register(self, nodes):
+        """Adds or updates nodes from a list of {"id", "type", "location"} dicts."""
+        table = self._table()
+        rows = []
+        for node in nodes:
+            node_id = str(node.get("id") or "").strip()
+            if not node_id:
+                raise ValueError("Every node needs an id.")
+            if not is_valid_node_id(node_id):
+                raise ValueError(
+                    f"Invalid node id '{node_id}': use up to 64 letters, digits, '.', '_' or '-'."
+                )
+            rows.append((node_id, node.get("type"), node.get("location")))
+
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            """
+            INSERT INTO nodes (id, type, location, registered_at) VALUES (?, ?, ?, datetime('now'))
+            ON CONFLICT (id) DO UPDATE SET type = excluded.type, location = excluded.location
+            """,
+            rows,
+        )
+        conn.commit()
+        conn.close()
+
+        with self._lock:
+            for node_id, node_type, location in rows:
+                if node_id in table:
+                    table[node_id]["type"] = node_type
+                    table[node_id]["location"] = location
+                else:
+                    table[node_id] = {
+                        "id": node_id,
+                        "type": node_type,
+                        "location": location,
+                        "reported": "Verified",
+                        "last_seen": None,
+                    }
+                    bisect.insort(self._sorted_ids, node_id)
+        return len(rows)
+
+    def record_heartbeats(self, heartbeats):
+        """Applies a batch of {"id", "status"} heartbeats.
+
+        Returns (accepted_count, unknown_ids). last_seen is persisted in one
+        transaction per batch so statuses survive a restart.
+        """
+        table = self._table()
+        now = time.time()
+        accepted = []
+        unknown = []
+        for beat in heartbeats:
+            node_id = str(beat.get("id") or "")
+            status = beat.get("status") or "Verified"
+            if status not in REPORTABLE_STATUSES:
+                raise ValueError(f"status must be one of {', '.join(REPORTABLE_STATUSES)}.")
+            if node_id not in table:
+                unknown.append(node_id)
+                continue
+            accepted.append((status, now, node_id))
+
+        with self._lock:
+            for status, seen, node_id in accepted:
+                table[node_id]["reported"] = status
+                table[node_id]["last_seen"] = seen
+
+        if accepted:
+            conn = sqlite3.connect(self.db_path)
+            conn.executemany(
+                "UPDATE nodes SET last_status = ?, last_seen = ? WHERE id = ?", accepted
+            )
+            conn.commit()
+            conn.close()
+        return len(accepted), unknown
+
+    def _snapshot(self):
+        table = self._table()
+        with self._lock:
+            return list(table.values())
+
+    def list(self, offset=0, limit=None):
+        table = self._table()
+        now = time.time()
+        end = None if limit is None else offset + limit
+        with self._lock:
+            page = [table[i] for i in self._sorted_ids[offset:end]]
+        return [self._public(node, now) for node in page]
+
+    def has_node(self, node_id):
+        return node_id in self._table()
+
+    def count(self):
+        return len(self._table())
+
+    def statuses(self):
+        """Maps every node id to its current status."""
+        now = time.time()
+        return {node["id"]: self._status(node, now) for node in self._snapshot()}
+
+    def statuses_for(self, node_ids):
+        """Current status of each given (known) node id."""
+        table = self._table()
+        now = time.time()
+        with self._lock:
+            nodes = [table[i] for i in node_ids if i in table]
+        return {node["id"]: self._status(node, now) for node in nodes}
+
+    def status_counts(self):
+        counts = dict.fromkeys(NODE_STATUSES, 0)
+        now = time.time()
+        for node in self._snapshot():
+            counts[self._status(node, now)] += 1
+        return counts
+
+
+node_registry = NodeRegistry(DATABASE_FILE)
+
+
+def get_registered_nodes(offset=0, limit=None):
+    """Returns registered nodes (sorted by id) with their live status."""
+    return node_registry.list(offset, limit)
 
 
 def get_total_nodes_count():
     """Returns the total count of registered nodes."""
-    return len(VERIFIED_NODES)
+    return node_registry.count()
+
+
+def get_node_status_counts():
+    """Returns how many nodes are currently Verified / Syncing / Offline."""
+    return node_registry.status_counts()
@@ -0,0 +1,101 @@
+# Streaming bulk export of the `registry` table as JSONL or CSV.
+#
+# Rows are read in id order in small keyset batches ("WHERE id > ? LIMIT n"),
+# so memory stays flat however large the table is and no read lock is held on
+# the database for the length of the export (writers keep going). Pass the
+# last exported id as `after_id` to fetch only newer records next time.
+#
+# CLI:
+#   python registry_export.py --format csv --after-id 1200 --gzip -o registry.csv.gz
+
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+import zlib
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ("id", "filename", "sha256", "ipfs_url", "tx_hash", "timestamp")
+EXPORT_FORMATS = ("jsonl", "csv")
+
+
+def iter_registry_rows(db_path, after_id=0, batch_size=EXPORT_BATCH_SIZE):
+    """Yields registry rows (tuples in EXPORT_COLUMNS order) with id > after_id."""
+    columns = ", ".join(EXPORT_COLUMNS)
+    last_id = after_id or 0
+    while True:
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(
+                f"SELECT {columns} FROM registry WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1][0]
+
+
+def iter_registry_export(db_path, fmt="jsonl", after_id=0, batch_size=EXPORT_BATCH_SIZE):
+    """Yields the export as text chunks, one chunk per batch of rows."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}.")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+
+    count = 0
+    for row in iter_registry_rows(db_path, after_id, batch_size):
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n")
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_stream(chunks):
+    """Compresses an iterable of text chunks into a gzip byte stream."""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the registry table as JSONL or CSV.")
+    parser.add_argument("--db", default="file_registry.db", help="SQLite database file")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl")
+    parser.add_argument("--after-id", type=int, default=0, help="only export records with id > AFTER_ID")
+    parser.add_argument("--gzip", action="store_true", help="gzip-compress the output")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    chunks = iter_registry_export(args.db, args.format, args.after_id)
+    if args.gzip:
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        for data in gzip_stream(chunks):
+            out.write(data)
+    else:
+        out = open(args.output, "w", newline="") if args.output else sys.stdout
+        for text in chunks:
+            out.write(text)
+    if args.output:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
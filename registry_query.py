@@ -0,0 +1,277 @@
+# Query helpers for the `registry` table: keyset (cursor) pagination, filters
+# and an FTS5 full-text index over the filename and anchoring metadata.
+#
+# Pages are always addressed by the last seen `id` ("WHERE id < ?") instead of
+# OFFSET, so fetching page 10,000 costs the same as fetching page 1.
+
+import base64
+import json
+import sqlite3
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+FETCH_BATCH_SIZE = 100  # Rows pulled from SQLite per fetchmany() while streaming
+
+REGISTRY_COLUMNS = ("id", "filename", "sha256", "ipfs_url", "tx_hash", "timestamp")
+HEX_DIGITS = set("0123456789abcdef")
+# The search index is contentless and stores the CID and tx hash without their
+# "ipfs://" / "0x" prefixes, so those don't match every single row.
+FTS_SCHEMA_MARKER = "content=''"
+BOILERPLATE_PREFIXES = ("ipfs://", "0x")
+
+
+def _fts_values(alias):
+    """SQL for the indexed values of a registry row (`alias` is new/old/a table alias)."""
+    return (
+        f"{alias}.filename, {alias}.sha256, "
+        f"CASE WHEN {alias}.ipfs_url LIKE 'ipfs://%' THEN substr({alias}.ipfs_url, 8) ELSE {alias}.ipfs_url END, "
+        f"CASE WHEN {alias}.tx_hash LIKE '0x%' THEN substr({alias}.tx_hash, 3) ELSE {alias}.tx_hash END"
+    )
+
+
+def ensure_registry_indexes(conn):
+    """Creates the secondary indexes and the FTS5 search index for `registry`.
+
+    Expects the `registry` table to exist already. Safe to call repeatedly.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_registry_timestamp ON registry (timestamp)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_registry_sha256 ON registry (sha256)")
+
+    cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'registry_fts'"
+    )
+    row = cursor.fetchone()
+    if row and FTS_SCHEMA_MARKER not in row[0]:
+        # Older external-content index that also matched the "ipfs://" / "0x"
+        # boilerplate of every row; replace it with the current layout.
+        cursor.executescript("""
+            DROP TRIGGER IF EXISTS registry_fts_ai;
+            DROP TRIGGER IF EXISTS registry_fts_ad;
+            DROP TRIGGER IF EXISTS registry_fts_au;
+            DROP TABLE registry_fts;
+        """)
+        row = None
+    fts_exists = row is not None
+    try:
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS registry_fts USING fts5(
+                filename, sha256, cid, tx, {FTS_SCHEMA_MARKER}
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite builds without FTS5 still get pagination and filters;
+        # text search falls back to a LIKE scan in build_registry_query().
+        print(f"Warning: FTS5 unavailable, registry search will be slower: {e}")
+        conn.commit()
+        return
+
+    # Keep the contentless index in sync with the registry table. Deletes must
+    # repeat the exact indexed values, hence the shared expressions.
+    new_values = _fts_values("new")
+    old_values = _fts_values("old")
+    cursor.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS registry_fts_ai AFTER INSERT ON registry BEGIN
+            INSERT INTO registry_fts (rowid, filename, sha256, cid, tx) VALUES (new.id, {new_values});
+        END;
+        CREATE TRIGGER IF NOT EXISTS registry_fts_ad AFTER DELETE ON registry BEGIN
+            INSERT INTO registry_fts (registry_fts, rowid, filename, sha256, cid, tx)
+            VALUES ('delete', old.id, {old_values});
+        END;
+        CREATE TRIGGER IF NOT EXISTS registry_fts_au AFTER UPDATE ON registry BEGIN
+            INSERT INTO registry_fts (registry_fts, rowid, filename, sha256, cid, tx)
+            VALUES ('delete', old.id, {old_values});
+            INSERT INTO registry_fts (rowid, filename, sha256, cid, tx) VALUES (new.id, {new_values});
+        END;
+    """)
+
+    if not fts_exists:
+        # Index rows that were anchored before the search index existed
+        cursor.execute(
+            f"INSERT INTO registry_fts (rowid, filename, sha256, cid, tx) "
+            f"SELECT r.id, {_fts_values('r')} FROM registry r"
+        )
+    conn.commit()
+
+
+def has_fts_index(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'registry_fts'"
+    )
+    return cursor.fetchone() is not None
+
+
+# --- Cursor Encoding ---
+def encode_cursor(last_id):
+    """Turns the last returned row id into an opaque pagination cursor."""
+    raw = json.dumps({"id": last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(). Raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(last_id, int):
+        raise ValueError("Invalid cursor.")
+    return last_id
+
+
+# --- Query Building ---
+def parse_registry_filters(args):
+    """Validates query-string arguments into a filters dict.
+
+    Raises ValueError with a user-facing message on bad input.
+    """
+    filters = {}
+
+    limit = args.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer.")
+    filters["limit"] = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if args.get("cursor"):
+        filters["after_id"] = decode_cursor(args["cursor"])
+
+    # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS' text, which sorts correctly
+    for key in ("since", "until"):
+        if args.get(key):
+            filters[key] = args[key].replace("T", " ")
+
+    has_tx = args.get("has_tx")
+    if has_tx is not None and has_tx != "":
+        if has_tx.lower() in ("1", "true", "yes"):
+            filters["has_tx"] = True
+        elif has_tx.lower() in ("0", "false", "no"):
+            filters["has_tx"] = False
+        else:
+            raise ValueError("has_tx must be true or false.")
+
+    prefix = (args.get("sha256_prefix") or "").lower()
+    if prefix:
+        if not set(prefix) <= HEX_DIGITS or len(prefix) > 64:
+            raise ValueError("sha256_prefix must be up to 64 hex characters.")
+        filters["sha256_prefix"] = prefix
+
+    q = (args.get("q") or "").strip()
+    if q:
+        filters["q"] = q
+
+    return filters
+
+
+def _fts_match_expression(q):
+    """Quotes each search term so user input can't break FTS5 query syntax.
+
+    A term typed with its "ipfs://" or "0x" prefix also matches the stored,
+    prefix-less CID / tx hash.
+    """
+    clauses = []
+    for term in q.split():
+        variants = [term]
+        for prefix in BOILERPLATE_PREFIXES:
+            if term.lower().startswith(prefix) and len(term) > len(prefix):
+                variants.append(term[len(prefix):])
+        quoted = [f'"{v.replace(chr(34), chr(34) * 2)}"*' for v in variants]
+        clauses.append(quoted[0] if len(quoted) == 1 else f"({' OR '.join(quoted)})")
+    return " ".join(clauses)
+
+
+def build_registry_query(filters, use_fts=True, after_id=None, limit=None):
+    """Returns (sql, params) selecting one keyset page of registry rows, newest first."""
+    columns = ", ".join(f"r.{c}" for c in REGISTRY_COLUMNS)
+    sql = f"SELECT {columns} FROM registry r"
+    where = []
+    params = []
+
+    if after_id is None:
+        after_id = filters.get("after_id")
+
+    q = filters.get("q")
+    # With a search, the FTS table drives the page: the cursor and the ordering
+    # are on its rowid, which FTS5 serves directly instead of sorting all matches.
+    key = "registry_fts.rowid" if q and use_fts else "r.id"
+    if q and use_fts:
+        sql = f"SELECT {columns} FROM registry_fts CROSS JOIN registry r ON r.id = registry_fts.rowid"
+        where.append("registry_fts MATCH ?")
+        params.append(_fts_match_expression(q))
+    elif q:
+        where.append("r.filename LIKE ?")
+        params.append(f"%{q}%")
+
+    if after_id is not None:
+        where.append(f"{key} < ?")
+        params.append(after_id)
+
+    if "since" in filters:
+        where.append("r.timestamp >= ?")
+        params.append(filters["since"])
+    if "until" in filters:
+        where.append("r.timestamp <= ?")
+        params.append(filters["until"])
+
+    if filters.get("has_tx") is True:
+        where.append("r.tx_hash IS NOT NULL AND r.tx_hash != ''")
+    elif filters.get("has_tx") is False:
+        where.append("(r.tx_hash IS NULL OR r.tx_hash = '')")
+
+    if "sha256_prefix" in filters:
+        # A range instead of LIKE so SQLite can use idx_registry_sha256
+        where.append("r.sha256 >= ? AND r.sha256 < ?")
+        params.extend([filters["sha256_prefix"], filters["sha256_prefix"] + "~"])
+
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {key} DESC LIMIT ?"
+    params.append(limit if limit is not None else filters["limit"])
+    return sql, params
+
+
+def row_to_record(row):
+    return {c: row[i] for i, c in enumerate(REGISTRY_COLUMNS)}
+
+
+def iter_registry_page_json(db_path, filters):
+    """Yields one page of results as chunks of a JSON document.
+
+    The body is streamed row by row so a large page is never held in memory:
+    {"items": [...], "next_cursor": "..." | null}
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        use_fts = has_fts_index(conn)
+        limit = filters["limit"]
+        # One extra row tells us whether another page exists
+        sql, params = build_registry_query(filters, use_fts=use_fts, limit=limit + 1)
+        cursor = conn.execute(sql, params)
+
+        yield '{"items": ['
+        sent = 0
+        last_id = None
+        has_more = False
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if sent == limit:
+                    has_more = True
+                    break
+                yield ("" if sent == 0 else ", ") + json.dumps(row_to_record(row))
+                last_id = row[0]
+                sent += 1
+            if has_more:
+                break
+
+        next_cursor = encode_cursor(last_id) if has_more else None
+        yield f'], "count": {sent}, "next_cursor": {json.dumps(next_cursor)}}}'
+    finally:
+        conn.close()
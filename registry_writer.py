@@ -0,0 +1,155 @@
+# Group-commit writer for file_registry.db.
+#
+# Every write is handed to one background thread through a queue. The thread
+# collects whatever arrives within a short window (or up to a batch size) and
+# commits it as a single transaction, grouping identical statements into one
+# executemany(). Concurrent uploads then share one fsync instead of each
+# opening a connection and fighting over SQLite's write lock.
+
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+MAX_BATCH_SIZE = 200
+MAX_BATCH_DELAY_SECONDS = 0.01
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Single-writer queue that batches SQLite writes into shared transactions.
+
+    setup: optional callable(conn) run once on the writer's connection, e.g. to
+    create tables. submit() returns a Future that resolves once the write has
+    been committed (or raises the error that made it fail).
+    """
+
+    def __init__(
+        self,
+        db_path,
+        setup=None,
+        max_batch=MAX_BATCH_SIZE,
+        max_delay=MAX_BATCH_DELAY_SECONDS,
+    ):
+        self.db_path = db_path
+        self.setup = setup
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches_committed = 0
+        self.writes_committed = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="registry-writer", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.close)
+
+    def submit(self, sql, params=()):
+        """Queues one statement; returns a Future resolved after commit."""
+        if self._closed:
+            raise RuntimeError("Registry writer is closed.")
+        self.start()
+        future = Future()
+        self._queue.put((sql, tuple(params), future))
+        return future
+
+    def close(self, timeout=10):
+        """Flushes everything queued so far and stops the writer thread."""
+        with self._lock:
+            if self._closed or not self._thread:
+                self._closed = True
+                return
+            self._closed = True
+            thread = self._thread
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _collect(self, first):
+        """Gathers a batch starting with `first`; returns (batch, stop_requested)."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    # Window is over, but still take anything already queued
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit(self, conn, batch):
+        # Consecutive writes with the same SQL go out as one executemany()
+        groups = []
+        for sql, params, future in batch:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+                groups[-1][2].append(future)
+            else:
+                groups.append((sql, [params], [future]))
+        try:
+            with conn:
+                for sql, rows, _ in groups:
+                    conn.executemany(sql, rows)
+        except sqlite3.Error:
+            # Something in the batch is bad; retry one by one so only it fails
+            for sql, params, future in batch:
+                try:
+                    with conn:
+                        conn.execute(sql, params)
+                    future.set_result(True)
+                except sqlite3.Error as e:
+                    future.set_exception(e)
+            return
+        self.batches_committed += 1
+        self.writes_committed += len(batch)
+        for _, _, futures in groups:
+            for future in futures:
+                future.set_result(True)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            if self.setup:
+                self.setup(conn)
+        except Exception as e:
+            print(f"Warning: registry writer setup failed: {e}")
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._collect(first)
+            try:
+                self._commit(conn, batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+        # Flush-on-shutdown: drain anything that slipped in behind the stop marker
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._commit(conn, leftover)
+        conn.close()
@@ -1,8 +1,14 @@
+import argparse
 import hashlib
 import os
 import datetime
+import sys
+import threading
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from incremental import MerkleMountainRange
 
 # --- PINATA CLOUD CONFIGURATION ---
 # Replace this with your actual Pinata JWT (Bearer Token)
@@ -11,6 +17,12 @@ PINATA_JWT = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJ1c2VySW5mb3JtYXRpb24iOnsia
 PINATA_PIN_URL = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
 # Using a public IPFS gateway to read the files back
 IPFS_GATEWAY_URL = "https://gateway.pinata.cloud/ipfs/" 
+IPFS_GATEWAY_TIMEOUT = 10  # Seconds; a stalled gateway must not block callers forever
+
+# --- CHUNK MANIFEST CONFIGURATION ---
+MANIFEST_CHUNK_SIZE = int(os.getenv("MANIFEST_CHUNK_SIZE", str(4 * 1024 * 1024)))
+# hashlib releases the GIL on large buffers, so threads hash chunks in parallel
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(8, os.cpu_count() or 1))))
 
 def generate_file_hash(file_path):
     """Generates a SHA-256 hash for a given file."""
@@ -24,10 +36,45 @@ def generate_file_hash(file_path):
             
     return sha256_hash.hexdigest()
 
-def store_file_metadata(file_path):
+def _hash_chunk(file_path, index, chunk_size):
+    """Returns (sha256 hex, newline count, length) of one chunk of a file."""
+    with open(file_path, "rb") as f:
+        f.seek(index * chunk_size)
+        chunk = f.read(chunk_size)
+    return hashlib.sha256(chunk).hexdigest(), chunk.count(b"\n"), len(chunk)
+
+def manifest_root(chunk_hashes):
+    """Merkle (mountain range) root over the per-chunk SHA-256 digests."""
+    mmr = MerkleMountainRange()
+    for chunk_hash in chunk_hashes:
+        mmr.append(bytes.fromhex(chunk_hash))
+    return mmr.root().hex()
+
+def build_chunk_manifest(file_path, chunk_size=MANIFEST_CHUNK_SIZE, workers=HASH_WORKERS):
+    """
+    Hashes a file in fixed-size chunks in parallel. The manifest lets a
+    verifier locate tampering and check any byte range on its own.
+    """
+    size = os.path.getsize(file_path)
+    count = -(-size // chunk_size)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda i: _hash_chunk(file_path, i, chunk_size), range(count)))
+    chunks = [r[0] for r in results]
+    return {
+        "algorithm": "sha256",
+        "chunk_size": chunk_size,
+        "size": size,
+        "chunks": chunks,
+        # Per-chunk newline counts so mismatches can be reported as row numbers
+        "line_counts": [r[1] for r in results],
+        "root": manifest_root(chunks),
+    }
+
+def store_file_metadata(file_path, chunk_manifest=False):
     """
     Generates hash, creates metadata, pins it to IPFS via Pinata Cloud, 
-    and returns the IPFS URL.
+    and returns the IPFS URL. With chunk_manifest=True the metadata also
+    carries per-chunk hashes (see build_chunk_manifest).
     """
     file_name = os.path.basename(file_path)
     file_type = os.path.splitext(file_name)[1].lower()
@@ -43,12 +90,22 @@ def store_file_metadata(file_path):
         "timestamp": timestamp,
         "sha256_hash": file_hash
     }
+    if chunk_manifest:
+        metadata["chunk_manifest"] = build_chunk_manifest(file_path)
     
-    # 3. Format the payload for Pinata
+    # 3. Pin it to IPFS
+    return pin_metadata(metadata, file_name)
+
+def pin_metadata(metadata, name):
+    """
+    Pins a metadata dict as JSON to IPFS via Pinata Cloud and returns its
+    ipfs:// URL, or None if the upload failed.
+    """
+    # Format the payload for Pinata
     payload = {
         "pinataContent": metadata,
         "pinataMetadata": {
-            "name": f"Metadata_{file_name}" # Names the file in your Pinata dashboard
+            "name": f"Metadata_{name}" # Names the file in your Pinata dashboard
         }
     }
     
@@ -57,7 +114,7 @@ def store_file_metadata(file_path):
         "Content-Type": "application/json"
     }
     
-    # 4. Store Metadata on Pinata (IPFS)
+    # Store Metadata on Pinata (IPFS)
     try:
         response = requests.post(PINATA_PIN_URL, json=payload, headers=headers)
         response.raise_for_status()
@@ -73,32 +130,202 @@ def store_file_metadata(file_path):
         print(f"Pinata Upload Failed. Check your JWT token and internet connection. Error: {e}")
         return None
 
-def verify_file_integrity(file_path, ipfs_url):
+def request_ipfs_metadata(ipfs_url):
     """
-    Fetches the original hash from a public IPFS gateway and compares 
-    it against the current file's hash.
+    Fetches a metadata JSON from the IPFS gateway. Returns None when the
+    gateway answers that the CID is unknown (4xx) or not JSON, and raises
+    requests.RequestException when the gateway itself is unreachable, slow
+    or failing (5xx), i.e. when nothing can be said about the CID.
     """
     if ipfs_url.startswith("ipfs://"):
         ipfs_cid = ipfs_url.replace("ipfs://", "")
     else:
         ipfs_cid = ipfs_url
-        
+
     # Fetch the metadata from IPFS using a public gateway
-    try:
-        response = requests.get(f"{IPFS_GATEWAY_URL}{ipfs_cid}")
+    response = requests.get(f"{IPFS_GATEWAY_URL}{ipfs_cid}", timeout=IPFS_GATEWAY_TIMEOUT)
+    if response.status_code >= 500:
         response.raise_for_status()
-        
-        stored_metadata = response.json()
-        stored_hash = stored_metadata.get("sha256_hash")
-        
+    if not response.ok:
+        print(f"IPFS gateway could not serve {ipfs_cid} (HTTP {response.status_code}).")
+        return None
+    try:
+        return json.loads(response.content)
+    except ValueError:
+        print("Data retrieved from IPFS is not valid JSON.")
+        return None
+
+def fetch_ipfs_metadata(ipfs_url):
+    """Fetches a metadata JSON from the IPFS gateway, or returns None on failure."""
+    try:
+        return request_ipfs_metadata(ipfs_url)
     except requests.exceptions.RequestException as e:
         print(f"Failed to retrieve metadata from IPFS gateway. Error: {e}")
+        return None
+
+def verify_file_integrity(file_path, ipfs_url):
+    """
+    Fetches the original hash from a public IPFS gateway and compares 
+    it against the current file's hash.
+    """
+    stored_metadata = fetch_ipfs_metadata(ipfs_url)
+    if stored_metadata is None:
         return False
-    except json.JSONDecodeError:
-        print("Data retrieved from IPFS is not valid JSON.")
-        return False
+    stored_hash = stored_metadata.get("sha256_hash")
 
     # Generate current hash and compare
     current_hash = generate_file_hash(file_path)
     
-    return current_hash == stored_hash
\ No newline at end of file
+    return current_hash == stored_hash
+
+def verify_file_chunks(file_path, manifest, fail_fast=False, byte_range=None, workers=HASH_WORKERS):
+    """
+    Verifies a file against a chunk manifest, hashing chunks in parallel.
+
+    byte_range=(start, end) only reads the chunks overlapping [start, end);
+    it must lie within the larger of the file and the manifested size.
+    fail_fast=True stops at the first mismatching chunk. Returns a report
+    with the byte ranges (and row numbers) of every chunk that differs.
+    """
+    chunk_size = manifest["chunk_size"]
+    expected = manifest["chunks"]
+    line_counts = manifest.get("line_counts")
+    size = os.path.getsize(file_path)
+    local_count = -(-size // chunk_size)
+    total = max(len(expected), local_count)
+
+    first, last = 0, total
+    if byte_range is not None:
+        start, end = byte_range
+        if start < 0 or end <= start:
+            raise ValueError("Invalid byte range.")
+        if end > max(size, manifest["size"]):
+            raise ValueError(f"Byte range ends past the end of the data ({max(size, manifest['size'])} bytes).")
+        first = min(start // chunk_size, total)
+        last = min(-(-end // chunk_size), total)
+
+    # Row numbers (1-based) of the first line in each original chunk
+    first_rows = None
+    if line_counts:
+        first_rows = [1]
+        for count in line_counts[:-1]:
+            first_rows.append(first_rows[-1] + count)
+
+    def describe(index, reason):
+        start = index * chunk_size
+        entry = {"chunk": index, "start": start, "end": min(start + chunk_size, max(size, manifest["size"])), "reason": reason}
+        if first_rows and index < len(first_rows):
+            entry["rows"] = [first_rows[index], first_rows[index] + line_counts[index]]
+        return entry
+
+    stop = threading.Event()
+
+    def check(index):
+        if stop.is_set():
+            return None
+        if index >= local_count:
+            return describe(index, "missing")
+        if index >= len(expected):
+            return describe(index, "extra")
+        digest, _, _ = _hash_chunk(file_path, index, chunk_size)
+        if digest != expected[index]:
+            return describe(index, "modified")
+        return False
+
+    mismatches = []
+    checked = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(check, i) for i in range(first, last)]
+        for future in as_completed(futures):
+            result = future.result()
+            if result is None:
+                continue
+            checked += 1
+            if result:
+                mismatches.append(result)
+                if fail_fast:
+                    stop.set()
+                    for f in futures:
+                        f.cancel()
+                    break
+
+    mismatches.sort(key=lambda m: m["chunk"])
+    # The chunk list itself must match the manifest's committed root
+    manifest_valid = manifest_root(expected) == manifest.get("root")
+    return {
+        "is_valid": (
+            manifest_valid
+            # Nothing checked proves nothing (an empty file against an empty manifest aside)
+            and (checked > 0 or (byte_range is None and total == 0))
+            and not mismatches
+            and (byte_range is not None or size == manifest["size"])
+        ),
+        "manifest_valid": manifest_valid,
+        "size_matches": size == manifest["size"],
+        "checked_chunks": checked,
+        "total_chunks": total,
+        "mismatches": mismatches,
+    }
+
+def load_chunk_manifest(source):
+    """Reads a chunk manifest from a local JSON file (manifest or full metadata) or an IPFS URL."""
+    if os.path.exists(source):
+        with open(source) as f:
+            data = json.load(f)
+    else:
+        data = fetch_ipfs_metadata(source)
+        if data is None:
+            raise ValueError(f"Could not fetch metadata from {source}.")
+    manifest = data.get("chunk_manifest", data)
+    if "chunks" not in manifest:
+        raise ValueError("No chunk manifest found.")
+    return manifest
+
+def parse_byte_range(text):
+    start, _, end = text.partition(":")
+    try:
+        return int(start or 0), int(end)
+    except ValueError:
+        raise argparse.ArgumentTypeError("range must look like START:END (bytes).")
+
+def main(argv=None):
+    """
+    Local chunk verification, for files too large to upload to /verify:
+      python storage.py manifest big.csv > manifest.json
+      python storage.py verify big.csv ipfs://<CID> --range 1073741824:1077936128
+    """
+    parser = argparse.ArgumentParser(description="Build or check chunk manifests for local files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("manifest", help="print the chunk manifest of a file as JSON")
+    build.add_argument("file")
+    build.add_argument("--chunk-size", type=int, default=MANIFEST_CHUNK_SIZE)
+
+    check = sub.add_parser("verify", help="check a file against a chunk manifest")
+    check.add_argument("file")
+    check.add_argument("manifest", help="ipfs:// URL of the metadata, or a local manifest/metadata JSON file")
+    check.add_argument("--range", type=parse_byte_range, help="only check bytes START:END")
+    check.add_argument("--fail-fast", action="store_true")
+    check.add_argument("--workers", type=int, default=HASH_WORKERS)
+
+    args = parser.parse_args(argv)
+    if args.command == "manifest":
+        print(json.dumps(build_chunk_manifest(args.file, args.chunk_size), indent=2))
+        return 0
+
+    try:
+        report = verify_file_chunks(
+            args.file,
+            load_chunk_manifest(args.manifest),
+            fail_fast=args.fail_fast,
+            byte_range=args.range,
+            workers=args.workers,
+        )
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(report, indent=2))
+    return 0 if report["is_valid"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
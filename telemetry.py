@@ -0,0 +1,285 @@
+# Streaming telemetry ingestion for field nodes.
+#
+# Batches of readings are appended as JSON lines to an open segment file per node:
+#   telemetry/<node_id>/<node_id>-<UTC time>-<seq>.jsonl.part       (open, being written)
+#   telemetry/<node_id>/<node_id>-<UTC time>-<seq>.jsonl            (sealed, waiting to be anchored)
+#   telemetry/<node_id>/anchored/<node_id>-<UTC time>-<seq>.jsonl   (hashed, pinned and anchored)
+#   telemetry/<node_id>/failed/<node_id>-<UTC time>-<seq>.jsonl     (gave up after MAX_ANCHOR_ATTEMPTS)
+#   telemetry/<node_id>/<node_id>-<UTC time>-<seq>.jsonl.progress.json
+#       steps already done for a sealed segment (IPFS URL, tx hash...), so a retry
+#       after a failure, or after a restart, resumes instead of pinning and anchoring again
+# A segment is sealed once it reaches the size limit or gets too old. Sealed
+# segments are anchored one at a time by a background worker; while too many
+# are waiting, new batches are refused so the caller backs off. A segment whose
+# anchoring fails is retried later without holding up the segments behind it.
+# Every line carries the node id, so segments from different nodes never hash
+# to the same file digest.
+
+import atexit
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+from registered_nodes import is_valid_node_id
+
+TELEMETRY_FOLDER = "telemetry"
+MAX_SEGMENT_BYTES = int(os.getenv("TELEMETRY_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+MAX_SEGMENT_AGE_SECONDS = int(os.getenv("TELEMETRY_SEGMENT_SECONDS", "300"))
+MAX_PENDING_SEGMENTS = int(os.getenv("TELEMETRY_MAX_PENDING", "50"))
+MAX_READINGS_PER_BATCH = 10000
+ANCHOR_RETRY_SECONDS = 30
+MAX_ANCHOR_ATTEMPTS = int(os.getenv("TELEMETRY_MAX_ATTEMPTS", "10"))
+
+OPEN_SUFFIX = ".jsonl.part"
+SEALED_SUFFIX = ".jsonl"
+PROGRESS_SUFFIX = ".progress.json"
+ANCHORED_FOLDER = "anchored"
+FAILED_FOLDER = "failed"
+
+
+class Backpressure(Exception):
+    """Raised when the anchoring stage is too far behind to accept more data."""
+
+    def __init__(self, retry_after):
+        super().__init__("Telemetry anchoring is behind; retry later.")
+        self.retry_after = retry_after
+
+
+class SegmentProgress(dict):
+    """Anchoring progress of one sealed segment, written to a sidecar file on every update."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as f:
+                super().__init__(json.load(f))
+        except (OSError, ValueError):
+            super().__init__()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self, f)
+        os.replace(tmp_path, self.path)
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Segment:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+        self.opened_at = time.time()
+
+
+class TelemetryIngestor:
+    """Appends node readings to rolling segments and anchors sealed ones.
+
+    anchor_segment: callable(sealed_path, progress); it must hash, pin, anchor
+    and record the file and raise on failure. `progress` is a dict persisted on
+    every assignment: store each step's result in it and skip steps already
+    present, so a retry only redoes what failed.
+    """
+
+    def __init__(
+        self,
+        anchor_segment,
+        base_dir=TELEMETRY_FOLDER,
+        max_bytes=MAX_SEGMENT_BYTES,
+        max_age=MAX_SEGMENT_AGE_SECONDS,
+        max_pending=MAX_PENDING_SEGMENTS,
+    ):
+        self.anchor_segment = anchor_segment
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self._segments = {}  # node_id -> open Segment
+        self._locks = {}  # node_id -> Lock guarding that node's segment
+        self._locks_guard = threading.Lock()
+        self._pending = queue.PriorityQueue()  # (not_before, order, sealed_path)
+        self._order = itertools.count()
+        self._pending_count = 0
+        self._pending_lock = threading.Lock()
+        self._seq = 0
+        self._started = False
+        self._stop = threading.Event()
+        self.anchored_count = 0
+        self.failed_count = 0
+
+    # --- Lifecycle ---
+    def start(self):
+        """Recovers segments left over from a previous run and starts the workers."""
+        if self._started:
+            return
+        self._started = True
+        os.makedirs(self.base_dir, exist_ok=True)
+        for node_id in sorted(os.listdir(self.base_dir)):
+            node_dir = os.path.join(self.base_dir, node_id)
+            if not os.path.isdir(node_dir) or not is_valid_node_id(node_id):
+                continue
+            for name in sorted(os.listdir(node_dir)):
+                path = os.path.join(node_dir, name)
+                if name.endswith(OPEN_SUFFIX):
+                    self._enqueue(self._rename_sealed(path))
+                elif name.endswith(SEALED_SUFFIX):
+                    self._enqueue(path)
+        threading.Thread(target=self._anchor_worker, name="telemetry-anchor", daemon=True).start()
+        threading.Thread(target=self._rollover_worker, name="telemetry-rollover", daemon=True).start()
+        atexit.register(self.close)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        """Stops the workers and seals open segments; they are anchored on the next start()."""
+        self.stop()
+        self.seal_all()
+
+    def pending_segments(self):
+        with self._pending_lock:
+            return self._pending_count
+
+    # --- Ingestion ---
+    def _node_lock(self, node_id):
+        with self._locks_guard:
+            lock = self._locks.get(node_id)
+            if lock is None:
+                lock = self._locks[node_id] = threading.Lock()
+            return lock
+
+    def _node_dir(self, node_id):
+        """Folder for a node's segments; refuses ids that would resolve outside base_dir."""
+        if not is_valid_node_id(node_id):
+            raise ValueError("Invalid node id.")
+        node_dir = os.path.join(self.base_dir, node_id)
+        base = os.path.realpath(self.base_dir)
+        if os.path.dirname(os.path.realpath(node_dir)) != base:
+            raise ValueError("Invalid node id.")
+        return node_dir
+
+    def _new_segment_path(self, node_id):
+        node_dir = self._node_dir(node_id)
+        os.makedirs(node_dir, exist_ok=True)
+        with self._locks_guard:
+            self._seq += 1
+            seq = self._seq
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        return os.path.join(node_dir, f"{node_id}-{stamp}-{seq:06d}{OPEN_SUFFIX}")
+
+    def ingest(self, node_id, readings):
+        """Appends a batch of readings (dicts) for one node. Returns bytes written."""
+        self._node_dir(node_id)
+        if not isinstance(readings, list) or not readings:
+            raise ValueError("Expected a non-empty 'readings' list.")
+        if len(readings) > MAX_READINGS_PER_BATCH:
+            raise ValueError(f"At most {MAX_READINGS_PER_BATCH} readings per batch.")
+        if any(not isinstance(r, dict) for r in readings):
+            raise ValueError("Each reading must be a JSON object.")
+        if self.pending_segments() >= self.max_pending:
+            raise Backpressure(ANCHOR_RETRY_SECONDS)
+
+        received_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        data = "".join(
+            json.dumps({"received_at": received_at, **r, "node_id": node_id}, sort_keys=True, separators=(",", ":")) + "\n"
+            for r in readings
+        ).encode()
+
+        with self._node_lock(node_id):
+            segment = self._segments.get(node_id)
+            if segment is None:
+                segment = self._segments[node_id] = Segment(self._new_segment_path(node_id))
+            segment.file.write(data)
+            segment.file.flush()
+            segment.size += len(data)
+            if segment.size >= self.max_bytes:
+                self._seal(node_id)
+        return len(data)
+
+    # --- Sealing & Anchoring ---
+    def _rename_sealed(self, path):
+        sealed = path[: -len(OPEN_SUFFIX)] + SEALED_SUFFIX
+        os.replace(path, sealed)
+        return sealed
+
+    def _seal(self, node_id):
+        """Closes the node's open segment and queues it for anchoring. Caller holds the node lock."""
+        segment = self._segments.pop(node_id, None)
+        if segment is None:
+            return
+        segment.file.close()
+        self._enqueue(self._rename_sealed(segment.path))
+
+    def _enqueue(self, sealed_path):
+        with self._pending_lock:
+            self._pending_count += 1
+        self._pending.put((0, next(self._order), sealed_path))
+
+    def _retire(self, sealed_path, progress, folder):
+        """Moves a segment out of the queue into `folder`; it no longer counts as pending."""
+        target_dir = os.path.join(os.path.dirname(sealed_path), folder)
+        os.makedirs(target_dir, exist_ok=True)
+        os.replace(sealed_path, os.path.join(target_dir, os.path.basename(sealed_path)))
+        if folder == FAILED_FOLDER:
+            # Keep the step results next to the failed segment for inspection
+            os.replace(progress.path, os.path.join(target_dir, os.path.basename(progress.path)))
+        else:
+            progress.discard()
+        with self._pending_lock:
+            self._pending_count -= 1
+
+    def seal_all(self):
+        """Seals every open segment, e.g. on shutdown."""
+        for node_id in list(self._segments):
+            with self._node_lock(node_id):
+                self._seal(node_id)
+
+    def _rollover_worker(self):
+        while not self._stop.wait(1):
+            now = time.time()
+            for node_id, segment in list(self._segments.items()):
+                if now - segment.opened_at >= self.max_age:
+                    with self._node_lock(node_id):
+                        # Re-check: the segment may have rolled over by size meanwhile
+                        if self._segments.get(node_id) is segment:
+                            self._seal(node_id)
+
+    def _anchor_worker(self):
+        while not self._stop.is_set():
+            try:
+                not_before, order, sealed_path = self._pending.get(timeout=1)
+            except queue.Empty:
+                continue
+            delay = not_before - time.time()
+            if delay > 0:
+                # Earliest entry isn't due yet, so nothing is; new segments
+                # (not_before 0) jump ahead of it while we wait.
+                self._pending.put((not_before, order, sealed_path))
+                self._stop.wait(min(delay, 1))
+                continue
+            progress = SegmentProgress(sealed_path + PROGRESS_SUFFIX)
+            try:
+                self.anchor_segment(sealed_path, progress)
+            except Exception as e:
+                self.failed_count += 1
+                attempts = progress.get("attempts", 0) + 1
+                progress["attempts"] = attempts
+                if attempts >= MAX_ANCHOR_ATTEMPTS:
+                    print(f"Warning: giving up on telemetry segment {sealed_path} after {attempts} attempts: {e}")
+                    self._retire(sealed_path, progress, FAILED_FOLDER)
+                else:
+                    print(f"Warning: anchoring telemetry segment {sealed_path} failed (attempt {attempts}): {e}")
+                    # Still counted as pending, so backpressure holds while it waits
+                    self._pending.put((time.time() + ANCHOR_RETRY_SECONDS, order, sealed_path))
+                continue
+            self._retire(sealed_path, progress, ANCHORED_FOLDER)
+            self.anchored_count += 1